@@ -0,0 +1,153 @@
+"""Look up the azure build ids of feedstocks, for the badges in their READMEs.
+
+All build definitions of an azure project are listed with a single request, and kept for
+a day in ``~/.nwb-extensions-smithy/azure_build_ids.json``.  Rerendering many feedstocks
+of the same project then asks azure at most once, and a feedstock that has no build
+definition yet is known not to have one without asking again for an hour.
+
+When the definitions cannot be listed, e.g. because the listing of a large project does
+not finish in time, the definition of the feedstock is looked up by its name instead, and
+the listing is not tried again for ``UNREACHABLE_TTL``.  The lookups are bounded by a
+timeout, when azure cannot be reached the build id is simply left out.
+"""
+import logging
+import os
+import time
+
+from .utils import JSONFileCache
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE = os.path.expanduser("~/.nwb-extensions-smithy/azure_build_ids.json")
+# build definitions are hardly ever renamed or removed
+CACHE_TTL = 24 * 60 * 60
+# but new feedstocks are registered every now and then
+MISSING_TTL = 60 * 60
+# seconds a lookup may take, across all the requests it needs
+TIMEOUT = 10
+# seconds get_build_id may take, the listing of the project then the lookup by name
+LOOKUP_TIMEOUT = 2 * TIMEOUT
+# seconds during which a project that could not be listed is only looked up by name
+UNREACHABLE_TTL = 5 * 60
+
+DEFINITIONS_URL = "https://dev.azure.com/{org}/{project_name}/_apis/build/definitions"
+
+_default_cache = None
+# when the listing of the (org, project_name) pairs last failed
+_unreachable = {}
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = JSONFileCache(CACHE_FILE, CACHE_TTL)
+    return _default_cache
+
+
+def _project_key(org, project_name):
+    return "{}/{}".format(org, project_name)
+
+
+def _definition_key(org, project_name, repo):
+    return "{}/{}/{}".format(org, project_name, repo)
+
+
+def list_build_ids(org, project_name, timeout=TIMEOUT, name=None):
+    """Map the names of all build definitions of the azure project to their ids.
+
+    With a ``name`` only the definition of that name is listed.
+    """
+    import requests
+
+    deadline = time.monotonic() + timeout
+    url = DEFINITIONS_URL.format(org=org, project_name=project_name)
+    params = {"api-version": "5.0"}
+    if name is not None:
+        params["name"] = name
+    build_ids = {}
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise requests.Timeout(
+                "Listing the build definitions of {} took longer than {}s".format(
+                    url, timeout
+                )
+            )
+        resp = requests.get(url, params=params, timeout=remaining)
+        resp.raise_for_status()
+        for definition in resp.json()["value"]:
+            build_ids[definition["name"]] = definition["id"]
+        continuation_token = resp.headers.get("x-ms-continuationtoken")
+        if not continuation_token:
+            return build_ids
+        params["continuationToken"] = continuation_token
+
+
+def prefetch(org, project_name, timeout=TIMEOUT, cache=None):
+    """List the build definitions of the azure project into the cache.
+
+    Returns whether the definitions could be listed.
+    """
+    import requests
+
+    cache = default_cache() if cache is None else cache
+    failed = _unreachable.get((org, project_name))
+    if failed is not None and time.monotonic() - failed < UNREACHABLE_TTL:
+        return False
+    try:
+        build_ids = list_build_ids(org, project_name, timeout=timeout)
+    except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+        logger.info(
+            "Cannot list the azure build definitions of %s/%s: %s",
+            org,
+            project_name,
+            e,
+        )
+        _unreachable[(org, project_name)] = time.monotonic()
+        return False
+    _unreachable.pop((org, project_name), None)
+    values = {
+        _definition_key(org, project_name, name): build_id
+        for name, build_id in build_ids.items()
+    }
+    # marks when the cache knew every definition of the project
+    values[_project_key(org, project_name)] = time.time()
+    cache.update(values)
+    return True
+
+
+def get_build_id(org, project_name, repo, timeout=TIMEOUT, cache=None):
+    """The id of the build definition of ``repo``, or ``None`` if it has none or if azure
+    cannot be reached.
+
+    Both the listing of the project and the lookup by name may take ``timeout``, with the
+    default the whole lookup finishes within ``LOOKUP_TIMEOUT``.
+    """
+    import requests
+
+    cache = default_cache() if cache is None else cache
+    key = _definition_key(org, project_name, repo)
+    if key in cache:
+        return cache.get(key)
+    listed = cache.get(_project_key(org, project_name), 0)
+    if time.time() - listed <= MISSING_TTL:
+        return None
+    if prefetch(org, project_name, timeout=timeout, cache=cache):
+        return cache.get(key)
+    try:
+        build_id = list_build_ids(org, project_name, timeout=timeout, name=repo).get(
+            repo
+        )
+    except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+        logger.info(
+            "Cannot look up the azure build definition of %s/%s/%s: %s",
+            org,
+            project_name,
+            repo,
+            e,
+        )
+        return None
+    if build_id is not None:
+        cache[key] = build_id
+    return build_id
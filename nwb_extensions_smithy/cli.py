@@ -2,12 +2,17 @@ import os
 import subprocess
 import sys
 import argparse
+import contextlib
 import copy
+import functools
+import json
+import time
 
+from concurrent.futures import ProcessPoolExecutor
 from textwrap import dedent
 
 from . import feedstock_io
-# from . import lint_recipe
+from . import lint_recipe
 from . import azure_ci_utils
 from . import __version__
 from .metadata import MetaData
@@ -336,46 +341,113 @@ class AddAzureBuildId(Subcommand):
 #         )
 
 
-# class RecipeLint(Subcommand):
-#     subcommand = "recipe-lint"
-#
-#     def __init__(self, parser):
-#         super(RecipeLint, self).__init__(parser, "Lint a single NWB extension recipe.")
-#         scp = self.subcommand_parser
-#         scp.add_argument("--conda-forge", action="store_true")
-#         scp.add_argument("recipe_directory", default=[os.getcwd()], nargs="*")
-#
-#     def __call__(self, args):
-#         all_good = True
-#         for recipe in args.recipe_directory:
-#             lints, hints = lint_recipe.main(
-#                 os.path.join(recipe),
-#                 conda_forge=args.conda_forge,
-#                 return_hints=True,
-#             )
-#             if lints:
-#                 all_good = False
-#                 print(
-#                     "{} has some lint:\n  {}".format(
-#                         recipe, "\n  ".join(lints)
-#                     )
-#                 )
-#                 if hints:
-#                     print(
-#                         "{} also has some suggestions:\n  {}".format(
-#                             recipe, "\n  ".join(hints)
-#                         )
-#                     )
-#             elif hints:
-#                 print(
-#                     "{} has some suggestions:\n  {}".format(
-#                         recipe, "\n  ".join(hints)
-#                     )
-#                 )
-#             else:
-#                 print("{} is in fine form".format(recipe))
-#         # Exit code 1 for some lint, 0 for no lint.
-#         sys.exit(int(not all_good))
+def _lint_recipe(
+    recipe, conda_forge=False, select=None, ignore=None, profile_rules=False
+):
+    """Lint a single recipe of a ``recipe-lint`` batch, possibly in a worker process.
+
+    Returns the JSON serializable result of the recipe, and the ``RuleProfile`` of its
+    rules if ``profile_rules`` is set.
+    """
+    profile = lint_recipe.RuleProfile() if profile_rules else None
+    start = time.perf_counter()
+    result = {"recipe": recipe}
+    try:
+        result["lints"], result["hints"] = lint_recipe.main(
+            recipe,
+            conda_forge=conda_forge,
+            return_hints=True,
+            select=select,
+            ignore=ignore,
+            profile=profile,
+        )
+    except Exception as e:
+        result["lints"], result["hints"] = [], []
+        result["error"] = "{}: {}".format(type(e).__name__, e)
+    result["duration"] = round(time.perf_counter() - start, 3)
+    return result, profile
+
+
+class RecipeLint(Subcommand):
+    subcommand = "recipe-lint"
+
+    def __init__(self, parser):
+        super(RecipeLint, self).__init__(
+            parser,
+            "Lint NWB extension recipes, printing a line of JSON with the lints, hints "
+            "and duration of each recipe, in the order of the recipes given.",
+        )
+        scp = self.subcommand_parser
+        scp.add_argument("--conda-forge", action="store_true")
+        scp.add_argument(
+            "-j",
+            "--jobs",
+            type=int,
+            default=None,
+            help="The number of recipes linted in parallel, the number of CPUs by "
+            "default.",
+        )
+        scp.add_argument(
+            "--select",
+            type=lint_recipe.parse_rule_ids,
+            default=None,
+            help="Comma separated ids of the lint rules to run, e.g. L6,L20, or L or H "
+            "for all the lints or hints.  All the rules are run by default.",
+        )
+        scp.add_argument(
+            "--ignore",
+            type=lint_recipe.parse_rule_ids,
+            default=None,
+            help="Comma separated ids of the lint rules not to run.",
+        )
+        scp.add_argument(
+            "--profile-rules",
+            action="store_true",
+            help="Report the time spent in every lint rule, across all the recipes, "
+            "on stderr.",
+        )
+        scp.add_argument("recipe_directory", default=[os.getcwd()], nargs="*")
+
+    def __call__(self, args):
+        try:
+            lint_recipe.select_rules(args.select, args.ignore)
+        except ValueError as e:
+            self.subcommand_parser.error(str(e))
+
+        lint = functools.partial(
+            _lint_recipe,
+            conda_forge=args.conda_forge,
+            select=args.select,
+            ignore=args.ignore,
+            profile_rules=args.profile_rules,
+        )
+        recipes = list(args.recipe_directory)
+        jobs = args.jobs or os.cpu_count() or 1
+        profile = lint_recipe.RuleProfile() if args.profile_rules else None
+        all_good = True
+        with contextlib.ExitStack() as stack:
+            if jobs > 1 and len(recipes) > 1:
+                executor = stack.enter_context(
+                    ProcessPoolExecutor(max_workers=min(jobs, len(recipes)))
+                )
+                # yields the results in the order of the recipes
+                map_func = executor.map
+            else:
+                map_func = map
+            if args.conda_forge:
+                # the maintainers of all the recipes are checked at once, the recipes
+                # then find them cached
+                lint_recipe.prefetch_maintainers(recipes, map_func)
+            for result, recipe_profile in map_func(lint, recipes):
+                if result["lints"] or "error" in result:
+                    all_good = False
+                if profile is not None:
+                    profile.update(recipe_profile)
+                print(json.dumps(result), flush=True)
+        if profile is not None:
+            print(profile.report(), file=sys.stderr)
+        # Exit code 1 for some lint, 0 for no lint.
+        sys.exit(int(not all_good))
 
 
 def main():
@@ -392,13 +464,23 @@ def main():
         version=__version__,
         help="Show nwb-extensions-smithy's version, and exit.",
     )
+    parser.add_argument(
+        "--io-stats",
+        action="store_true",
+        help="Report the files, bytes and git operations of the command.",
+    )
 
     if not sys.argv[1:]:
         args = parser.parse_args(["--help"])
     else:
         args = parser.parse_args()
 
-    args.subcommand_func(args)
+    io_stats_baseline = feedstock_io.io_stats.snapshot()
+    try:
+        args.subcommand_func(args)
+    finally:
+        if args.io_stats:
+            feedstock_io.io_stats.write_report(since=io_stats_baseline)
 
 
 if __name__ == "__main__":
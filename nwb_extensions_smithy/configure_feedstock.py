@@ -1,12 +1,20 @@
+import fnmatch
 import glob
+import hashlib
 from itertools import product, chain
+import json
 import logging
 import os
+import posixpath
+import re
 import subprocess
 import textwrap
+import threading
 import yaml
 import warnings
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
 import copy
 
 import conda_build.api
@@ -19,6 +27,7 @@ from conda_build import __version__ as conda_build_version
 from jinja2 import Environment, FileSystemLoader
 
 from .feedstock_io import (
+    index_session,
     set_exe_file,
     write_file,
     remove_file,
@@ -26,6 +35,9 @@ from .feedstock_io import (
     remove_file_or_dir,
 )
 from . import __version__
+from . import azure_build_ids
+from . import feedstock_io
+from . import memory_profiling
 
 conda_forge_content = os.path.abspath(os.path.dirname(__file__))
 logger = logging.getLogger(__name__)
@@ -65,7 +77,8 @@ def copytree(src, dst, ignore=(), root_dst=None):
                 os.makedirs(d)
             copytree(s, d, ignore, root_dst=root_dst)
         else:
-            copy_file(s, d)
+            # the feedstock content rarely changes, most rerenders find it in place already
+            copy_file(s, d, skip_identical=True)
 
 
 def merge_list_of_dicts(list_of_dicts):
@@ -243,12 +256,344 @@ def _trim_unused_pin_run_as_build(all_used_vars):
         del all_used_vars["pin_run_as_build"]
 
 
-def _collapse_subpackage_variants(list_of_metas, root_path):
+# names that can show up in a selector or jinja statement of a recipe
+_recipe_expression_pat = re.compile(r"#\s*\[([^\[\]]+)\]|\{%(.*?)%\}|\{\{(.*?)\}\}", re.S)
+_identifier_pat = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+# jinja statements and functions that read files other than the recipe's own
+_recipe_include_pat = re.compile(
+    r"\{%-?\s*(include|import|from|extends)\b"
+    r"|\bload_(file_regex|file_data|setup_py_data|str_data)\b"
+)
+# the short names conda-build's ns_cfg derives from these variant keys, e.g. py36,
+# np115, pl526 or lua53
+_selector_short_names = {
+    "python": "py",
+    "numpy": "np",
+    "perl": "pl",
+    "lua": "lua",
+}
+
+
+class UsedVarsCache(object):
+    """Memoize the used-variable analysis of rendered recipe outputs.
+
+    ``MetaData.get_used_vars`` re-scans the recipe text and the build scripts on every call.
+    Its result only depends on the recipe content, the output, the target subdir and the
+    variant values that the selectors and jinja expressions of the recipe refer to, so that
+    is what the results are keyed on.  Outputs rendered once per variant, and platforms
+    rendered by more than one CI provider, are then only analyzed once per render.
+
+    Recipes that include or load other files are not memoized, their content is not
+    part of the key.
+    """
+
+    def __init__(self):
+        self._used_vars = {}
+        self._file_digests = {}
+        # a cache can be shared by renders running in several threads
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._used_vars.clear()
+            self._file_digests.clear()
+
+    def _file_digest(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None, b""
+        file_key = (path, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if file_key in self._file_digests:
+                return self._file_digests[file_key]
+        with open(path, "rb") as fh:
+            content = fh.read()
+        result = (hashlib.sha256(content).hexdigest(), content)
+        with self._lock:
+            self._file_digests[file_key] = result
+        return result
+
+    def _key(self, meta):
+        recipe_files = [meta.meta_path] + [
+            os.path.join(meta.path, script) for script in ("build.sh", "bld.bat")
+        ]
+        for script in (meta.meta.get("script"), meta.get_value("build/script")):
+            # outputs can point to a script file instead of inline commands
+            if isinstance(script, str) and os.path.isfile(
+                os.path.join(meta.path, script)
+            ):
+                recipe_files.append(os.path.join(meta.path, script))
+
+        digests = []
+        names = set()
+        for path in recipe_files:
+            digest, content = self._file_digest(path)
+            digests.append(digest)
+            text = content.decode("utf-8", "replace")
+            if _recipe_include_pat.search(text):
+                return None
+            for match in _recipe_expression_pat.finditer(text):
+                expression = " ".join(group for group in match.groups() if group)
+                names.update(_identifier_pat.findall(expression))
+
+        def is_referenced(key):
+            if key in names:
+                return True
+            short_name = _selector_short_names.get(key)
+            if short_name:
+                return any(name.startswith(short_name) for name in names)
+            return False
+
+        variant = meta.config.variant or {}
+        referenced_variant = tuple(
+            sorted((k, str(v)) for k, v in variant.items() if is_referenced(k))
+        )
+        return (
+            tuple(digests),
+            meta.name(),
+            meta.config.subdir,
+            referenced_variant,
+        )
+
+    def get_used_vars(self, meta, force_top_level=False):
+        recipe_key = self._key(meta)
+        if recipe_key is None:
+            return set(meta.get_used_vars(force_top_level=force_top_level))
+        key = (recipe_key, force_top_level)
+        with self._lock:
+            used_vars = self._used_vars.get(key)
+        if used_vars is None:
+            used_vars = frozenset(meta.get_used_vars(force_top_level=force_top_level))
+            with self._lock:
+                self._used_vars[key] = used_vars
+        return set(used_vars)
+
+    def get_used_loop_vars(self, meta, force_top_level=False):
+        # same definition as MetaData.get_used_loop_vars, but reusing the memoized scan
+        loop_vars = meta.get_loop_vars()
+        return {
+            var
+            for var in self.get_used_vars(meta, force_top_level=force_top_level)
+            if var in loop_vars
+        }
+
+
+class PinningCache(object):
+    """Keep the parsed conda-forge pinning, the exclusive variant config file.
+
+    conda-build reads, parses and applies the selectors of the large
+    ``conda_build_config.yaml`` of conda-forge-pinning for every platform of every CI
+    provider.  The result only depends on the content of the file, the target platform,
+    arch and variant of the config and the environment variables its selectors and jinja
+    expressions can see, so it is kept under these and reused by every render with the
+    same pinning, including those of other feedstocks.  These variables are the ones the
+    expressions name, the ``CF_*`` variables of the feedstock and ``ENVIRON``.  The
+    ``maxsize`` most recently used results are kept.
+    """
+
+    # environment variables conda-build reads when it parses a variant config file
+    ENVIRON = ("CI", "CONDA_BUILD_SYSROOT")
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._specs = OrderedDict()
+        # path -> (mtime_ns, size), digest and names of the expressions of the file
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._specs.clear()
+            self._files.clear()
+
+    def _file_info(self, path):
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._files.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1], cached[2]
+        with open(path, "rb") as fh:
+            content = fh.read()
+        names = set()
+        for match in _recipe_expression_pat.finditer(content.decode("utf-8", "replace")):
+            expression = " ".join(group for group in match.groups() if group)
+            names.update(_identifier_pat.findall(expression))
+        digest = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            self._files[path] = (stamp, digest, frozenset(names))
+        return digest, names
+
+    def parse_config_file(self, parse, path, config):
+        """``parse(path, config)``, reusing an earlier result for the same inputs."""
+        digest, names = self._file_info(path)
+        variant = json.dumps(config.variant, sort_keys=True, default=str)
+        environ = tuple(
+            sorted(
+                (k, v)
+                for k, v in os.environ.items()
+                if k in names or k in self.ENVIRON or k.startswith("CF_")
+            )
+        )
+        key = (digest, config.platform, config.arch, variant, environ)
+        with self._lock:
+            spec = self._specs.get(key)
+            if spec is not None:
+                self._specs.move_to_end(key)
+        if spec is None:
+            spec = parse(path, config)
+            with self._lock:
+                self._specs[key] = spec
+                while len(self._specs) > self.maxsize:
+                    self._specs.popitem(last=False)
+        # conda-build combines and migrates the specs in place
+        return copy.deepcopy(spec)
+
+
+# the pinning does not depend on the feedstock, so by default all renders share one cache
+_shared_pinning_cache = PinningCache()
+
+
+class RenderContext(object):
+    """Everything a single rerender keeps around besides the forge config itself.
+
+    Rendering functions take the context as an explicit argument instead of relying on
+    module level state, so that several feedstocks can be rerendered concurrently in
+    threads.  Pass the same ``used_vars_cache`` to several contexts to share it between
+    them; a ``profiler`` enables the memory instrumentation of the rerender phases.  Unless
+    a ``pinning_cache`` is given, the parsed variant files are shared by all contexts.
+
+    With ``keep_renders`` the conda-build renders of the recipe are kept on the context
+    and reused by later rerenders with the same context, until ``invalidate_renders`` is
+    called.  This is what lets watch mode skip conda-build when only templates changed.
+    Within ``holding_renders`` they are reused even without ``keep_renders``.
+    """
+
+    def __init__(
+        self,
+        used_vars_cache=None,
+        profiler=None,
+        keep_renders=False,
+        pinning_cache=None,
+    ):
+        self.used_vars_cache = (
+            UsedVarsCache() if used_vars_cache is None else used_vars_cache
+        )
+        self.pinning_cache = (
+            _shared_pinning_cache if pinning_cache is None else pinning_cache
+        )
+        self.profiler = profiler
+        self.renders = {} if keep_renders else None
+        self.resolve = None
+        # the future of the azure build id lookup started by the rerender, if any
+        self.azure_build_id = None
+
+    def cached_render(self, key, render):
+        """Return ``render()``, reusing an earlier result for ``key`` if renders are kept."""
+        if self.renders is None:
+            return render()
+        if key not in self.renders:
+            self.renders[key] = render()
+        return self.renders[key]
+
+    @contextmanager
+    def holding_renders(self):
+        """Reuse the renders of the recipe within the block, whether they are kept or not."""
+        if self.renders is not None:
+            yield
+            return
+        self.renders = {}
+        try:
+            yield
+        finally:
+            self.renders = None
+
+    def invalidate_renders(self):
+        if self.renders is not None:
+            self.renders.clear()
+        self.used_vars_cache.clear()
+
+    @contextmanager
+    def phase(self, name):
+        if self.profiler is None:
+            yield
+        else:
+            with self.profiler.phase(name):
+                yield
+
+
+# conda-build keeps module level caches and evaluates the selectors of variant files
+#     against os.environ, so calls into it are serialized and see the CF_* variables of the
+#     feedstock being rendered only while they run.
+_conda_build_lock = threading.RLock()
+
+
+def _forge_environ(forge_config):
+    return {
+        # the compiler stack
+        "CF_COMPILER_STACK": forge_config["compiler_stack"],
+        # valid ranges for the supported platforms
+        "CF_MIN_PY_VER": forge_config["min_py_ver"],
+        "CF_MAX_PY_VER": forge_config["max_py_ver"],
+        "CF_MIN_R_VER": forge_config["min_r_ver"],
+        "CF_MAX_R_VER": forge_config["max_r_ver"],
+    }
+
+
+@contextmanager
+def conda_build_session(forge_config):
+    """Hold the conda-build lock with the environment of the feedstock being rendered."""
+    with _conda_build_lock:
+        environ = _forge_environ(forge_config)
+        saved = {key: os.environ.get(key) for key in environ}
+        os.environ.update(environ)
+        try:
+            yield
+        finally:
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+
+@contextmanager
+def cached_pinning(forge_config, pinning_cache):
+    """Let conda-build parse the pinning, the exclusive config file, through
+    ``pinning_cache`` in this block, within a ``conda_build_session``.
+
+    The variant config files of the recipe are always parsed again.
+    """
+    pinning_file = forge_config.get("exclusive_config_file")
+    if pinning_cache is None or not pinning_file:
+        yield
+        return
+    pinning_file = os.path.realpath(pinning_file)
+    parse_config_file = conda_build.variants.parse_config_file
+
+    def parse_pinning(path, config):
+        if os.path.realpath(path) != pinning_file:
+            return parse_config_file(path, config)
+        return pinning_cache.parse_config_file(parse_config_file, path, config)
+
+    with _conda_build_lock:
+        conda_build.variants.parse_config_file = parse_pinning
+        try:
+            yield
+        finally:
+            conda_build.variants.parse_config_file = parse_config_file
+
+
+def _collapse_subpackage_variants(list_of_metas, root_path, context=None):
     """Collapse all subpackage node variants into one aggregate collection of used variables
 
     We get one node per output, but a given recipe can have multiple outputs.  Each output
     can have its own used_vars, and we must unify all of the used variables for all of the
     outputs"""
+    if context is None:
+        context = RenderContext()
+    used_vars_cache = context.used_vars_cache
 
     # things we consider "top-level" are things that we loop over with CI jobs.  We don't loop over
     #     outputs with CI jobs.
@@ -258,17 +603,19 @@ def _collapse_subpackage_variants(list_of_metas, root_path):
     all_variants = set()
 
     for meta in list_of_metas:
-        all_used_vars.update(meta.get_used_vars())
+        all_used_vars.update(used_vars_cache.get_used_vars(meta))
         all_variants.update(
             conda_build.utils.HashableDict(v) for v in meta.config.variants
         )
 
         all_variants.add(conda_build.utils.HashableDict(meta.config.variant))
 
-    top_level_loop_vars = list_of_metas[0].get_used_loop_vars(
-        force_top_level=True
+    top_level_loop_vars = used_vars_cache.get_used_loop_vars(
+        list_of_metas[0], force_top_level=True
+    )
+    top_level_vars = used_vars_cache.get_used_vars(
+        list_of_metas[0], force_top_level=True
     )
-    top_level_vars = list_of_metas[0].get_used_vars(force_top_level=True)
     if "target_platform" in all_used_vars:
         top_level_loop_vars.add("target_platform")
 
@@ -347,10 +694,9 @@ def _collapse_subpackage_variants(list_of_metas, root_path):
     logger.debug("top_level_loop_vars {}".format(top_level_loop_vars))
     logger.debug("used_key_values {}".format(used_key_values))
 
-    return (
-        break_up_top_level_values(top_level_loop_vars, used_key_values),
-        top_level_loop_vars,
-    )
+    with context.phase("break_up_top_level_values"):
+        configs = break_up_top_level_values(top_level_loop_vars, used_key_values)
+    return configs, top_level_loop_vars
 
 
 def _yaml_represent_ordereddict(yaml_representer, data):
@@ -361,6 +707,21 @@ def _yaml_represent_ordereddict(yaml_representer, data):
     )
 
 
+class _SubspaceConfigDumper(yaml.Dumper):
+    """Dumper for the .ci_support files, without the special object notation of PyYAML for
+    the objects that we dump.  Registering the representers on a subclass keeps the global
+    PyYAML dumpers untouched."""
+
+
+_SubspaceConfigDumper.add_representer(
+    set, yaml.representer.SafeRepresenter.represent_list
+)
+_SubspaceConfigDumper.add_representer(
+    tuple, yaml.representer.SafeRepresenter.represent_list
+)
+_SubspaceConfigDumper.add_representer(OrderedDict, _yaml_represent_ordereddict)
+
+
 def finalize_config(config, platform, forge_config):
     """For configs without essential parameters like docker_image
     add fallback value.
@@ -370,22 +731,22 @@ def finalize_config(config, platform, forge_config):
     return config
 
 
-def dump_subspace_config_files(metas, root_path, platform, arch, upload, forge_config):
+def dump_subspace_config_files(
+    metas, root_path, platform, arch, upload, forge_config, context=None
+):
     """With conda-build 3, it handles the build matrix.  We take what it spits out, and write a
     config.yaml file for each matrix entry that it spits out.  References to a specific file
     replace all of the old environment variables that specified a matrix entry."""
+    if context is None:
+        context = RenderContext()
 
     # identify how to break up the complete set of used variables.  Anything considered
     #     "top-level" should be broken up into a separate CI job.
 
-    configs, top_level_loop_vars = _collapse_subpackage_variants(metas, root_path)
-
-    # get rid of the special object notation in the yaml file for objects that we dump
-    yaml.add_representer(set, yaml.representer.SafeRepresenter.represent_list)
-    yaml.add_representer(
-        tuple, yaml.representer.SafeRepresenter.represent_list
-    )
-    yaml.add_representer(OrderedDict, _yaml_represent_ordereddict)
+    with context.phase("collapse_subpackage_variants"):
+        configs, top_level_loop_vars = _collapse_subpackage_variants(
+            metas, root_path, context=context
+        )
 
     platform_arch = "{}-{}".format(platform, arch)
     if arch == "64":
@@ -409,13 +770,225 @@ def dump_subspace_config_files(metas, root_path, platform, arch, upload, forge_c
         config = finalize_config(config, platform, forge_config)
 
         with write_file(out_path) as f:
-            yaml.dump(config, f, default_flow_style=False)
+            yaml.dump(
+                config, f, Dumper=_SubspaceConfigDumper, default_flow_style=False
+            )
 
         target_platform = config.get("target_platform", [platform_arch])[0]
         result.append((config_name, target_platform, upload, config))
+
+        if forge_config["skip_unchanged_configs"]:
+            forge_config.setdefault("config_dependencies", {})[
+                config_name
+            ] = _config_dependencies(
+                metas, config, top_level_loop_vars, root_path, platform, context
+            )
     return sorted(result)
 
 
+def _config_metas(metas, config, top_level_loop_vars):
+    """The metas of the variants that ``config`` builds, those whose values of the top level
+    loop variables are the ones of the config."""
+    matching = [
+        meta
+        for meta in metas
+        if all(
+            str(meta.config.variant[key]) in [str(value) for value in config[key]]
+            for key in top_level_loop_vars
+            if key in meta.config.variant and key in config
+        )
+    ]
+    return matching or metas
+
+
+def _config_dependencies(
+    metas, config, top_level_loop_vars, forge_dir, platform, context
+):
+    """What the build of ``config`` depends on, for the dependency manifest.
+
+    These are the recipe files besides ``RENDERED_RECIPE_FILES`` that its metadata refers
+    to, the keys of its variant config that its metadata uses, and a digest of its rendered
+    metadata, which tells whether an edit of ``RENDERED_RECIPE_FILES`` changed the config.
+    """
+    config_metas = _config_metas(metas, config, top_level_loop_vars)
+    config_meta_ids = set(id(meta) for meta in config_metas)
+    used_here = set()
+    used_elsewhere = set()
+    for meta in metas:
+        used = context.used_vars_cache.get_used_vars(meta)
+        if id(meta) in config_meta_ids:
+            used_here.update(used)
+        else:
+            used_elsewhere.update(used)
+    rendered = sorted(
+        hashlib.sha256(
+            json.dumps(meta.meta, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        for meta in config_metas
+    )
+    return {
+        "files": _recipe_files_used(config_metas, forge_dir, platform),
+        # keys of the variant config only used by the outputs of other configs are left out
+        "variant_keys": sorted(set(config) - (used_elsewhere - used_here)),
+        "rendered": hashlib.sha256(" ".join(rendered).encode("utf-8")).hexdigest(),
+    }
+
+
+def _referenced_recipe_files(meta):
+    """The paths, relative to the recipe, that the rendered ``meta`` refers to: the
+    patches and local sources, the build and test scripts and the test files."""
+    sources = meta.get_section("source")
+    if isinstance(sources, dict):
+        sources = [sources]
+    paths = []
+    for source in sources or []:
+        paths.extend(source.get("patches") or [])
+        if source.get("path"):
+            paths.append(source["path"])
+    for script in (
+        meta.meta.get("script"),
+        meta.get_value("build/script"),
+        meta.get_value("test/script"),
+    ):
+        # outputs can point to a script file instead of inline commands
+        if isinstance(script, str):
+            paths.append(script)
+    paths.extend(meta.get_value("test/files") or [])
+    return [posixpath.normpath(path.replace(os.sep, "/")) for path in paths]
+
+
+def _recipe_files_used(metas, forge_dir, platform):
+    """The files of the recipe that the builds of ``metas`` on ``platform`` use.
+
+    Besides the scripts that conda-build always looks at, these are the files that the
+    rendered metadata refers to, like patches, scripts and test files.  A directory or a
+    glob pattern stands for the files under it.  ``RENDERED_RECIPE_FILES`` are left out,
+    their effect on the config is known from the rendered metadata.
+    """
+    recipe_dir = os.path.join(forge_dir, "recipe")
+    if platform == "win":
+        used = ["bld.bat", "run_test.bat"]
+    else:
+        used = ["build.sh", "run_test.sh"]
+    used.extend(["run_test.py", "run_test.pl"])
+    for meta in metas:
+        used.extend(_referenced_recipe_files(meta))
+
+    def is_used(relpath):
+        return any(
+            relpath == path
+            or relpath.startswith(path + "/")
+            or fnmatch.fnmatch(relpath, path)
+            for path in used
+        )
+
+    files = []
+    for root, dirs, fnames in os.walk(recipe_dir):
+        for fname in fnames:
+            relpath = os.path.relpath(os.path.join(root, fname), recipe_dir)
+            relpath = relpath.replace(os.sep, "/")
+            if is_used(relpath):
+                files.append("recipe/" + relpath)
+    return sorted(files)
+
+
+# the recipe files that are rendered into the variant configs and metadata of the configs
+RENDERED_RECIPE_FILES = ("recipe/meta.yaml", "recipe/conda_build_config.yaml")
+
+
+def _git_blob_sha(path):
+    """The id git gives the content of ``path``, or ``None`` if there is no such file."""
+    try:
+        with open(path, "rb") as fh:
+            content = fh.read()
+    except OSError:
+        return None
+    header = "blob {}\0".format(len(content)).encode("utf-8")
+    return hashlib.sha1(header + content).hexdigest()
+
+
+def write_dependency_manifest(forge_config, forge_dir):
+    """Write what each config depends on to .ci_support, with the script that the CI jobs
+    use to compare it with the changes of a pull request.
+
+    Besides the dependencies of the configs, the manifest has the git ids of the
+    ``RENDERED_RECIPE_FILES`` it was made from, so that the script can tell whether it is
+    up-to-date with them.
+    """
+    manifest_file = os.path.join(forge_dir, ".ci_support", "dependency_manifest.json")
+    script_file = os.path.join(forge_dir, ".ci_support", "check_config_changes.py")
+    if not forge_config["skip_unchanged_configs"]:
+        for fname in (manifest_file, script_file):
+            if os.path.exists(fname):
+                remove_file(fname)
+        return
+    if not os.path.isdir(os.path.dirname(manifest_file)):
+        os.makedirs(os.path.dirname(manifest_file))
+    manifest = {
+        "configs": forge_config.get("config_dependencies", {}),
+        "rendered_from": {
+            path: _git_blob_sha(os.path.join(forge_dir, path))
+            for path in RENDERED_RECIPE_FILES
+        },
+    }
+    with write_file(manifest_file) as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+    copy_file(
+        os.path.join(conda_forge_content, "static", "check_config_changes.py"),
+        script_file,
+    )
+
+
+# The packages that the CI scripts install before building, part of the package cache key
+CI_SETUP_PACKAGES = ("conda-forge-ci-setup=2", "conda-build")
+
+# The solvers of the ``conda_solver`` option: the packages that bootstrap the solver, the
+#     tool installing the setup packages and the conda subcommand that builds the recipe.
+CONDA_SOLVERS = {
+    "conda": ((), "conda", "build"),
+    "mamba": (("mamba", "boa"), "mamba", "mambabuild"),
+    "libmamba": (("conda-libmamba-solver",), "conda", "build"),
+}
+
+
+def _setup_packages(forge_config):
+    return CI_SETUP_PACKAGES + tuple(forge_config["conda_solver_packages"].split())
+
+
+def conda_pkgs_cache_key(forge_dir, config_names, setup_packages=CI_SETUP_PACKAGES):
+    """The key of the conda package cache of a CI job that builds ``config_names``.
+
+    It changes whenever the variant configs or the setup packages change, which is when the
+    packages downloaded by the job change.
+    """
+    key = hashlib.sha256(" ".join(setup_packages).encode("utf-8"))
+    for config_name in config_names:
+        config_file = os.path.join(forge_dir, ".ci_support", config_name + ".yaml")
+        with open(config_file, "rb") as fh:
+            key.update(fh.read())
+    return key.hexdigest()
+
+
+# the upstream fast finish script, vendored unchanged by vendor_fast_finish_script
+FAST_FINISH_SCRIPT_URL = (
+    "https://raw.githubusercontent.com/conda-forge/conda-forge-ci-setup-feedstock/"
+    "{ref}/recipe/conda_forge_ci_setup/ff_ci_pr_build.py"
+)
+
+
+# the commit of conda-forge-ci-setup-feedstock to vendor the fast finish script from
+_commit_ref_pat = re.compile(r"^[0-9a-f]{7,40}$")
+
+
+def _vendored_fast_finish_script(forge_dir):
+    return os.path.join(forge_dir, ".ci_support", "ff_ci_pr_build.py")
+
+
+def _vendored_fast_finish_ref(forge_dir):
+    return os.path.join(forge_dir, ".ci_support", "ff_ci_pr_build.ref")
+
+
 def _get_fast_finish_script(
     provider_name, forge_config, forge_dir, fast_finish_text
 ):
@@ -424,11 +997,16 @@ def _get_fast_finish_script(
     tooling_branch = "master"
 
     cfbs_fpath = os.path.join(forge_dir, "recipe", "ff_ci_pr_build.py")
+    vendored = forge_config["vendor_fast_finish_script"] and os.path.exists(
+        _vendored_fast_finish_script(forge_dir)
+    )
     if provider_name == "appveyor":
         if os.path.exists(cfbs_fpath):
             fast_finish_script = "{recipe_dir}\\ff_ci_pr_build".format(
                 recipe_dir=forge_config["recipe_dir"]
             )
+        elif vendored:
+            fast_finish_script = ".ci_support\\ff_ci_pr_build"
         else:
             get_fast_finish_script = '''powershell -Command "(New-Object Net.WebClient).DownloadFile('https://raw.githubusercontent.com/conda-forge/conda-forge-ci-setup-feedstock/{branch}/recipe/conda_forge_ci_setup/ff_ci_pr_build.py', 'ff_ci_pr_build.py')"'''  # NOQA
             fast_finish_script += "ff_ci_pr_build"
@@ -450,6 +1028,8 @@ def _get_fast_finish_script(
             get_fast_finish_script += "cat {recipe_dir}/ff_ci_pr_build.py".format(
                 recipe_dir=forge_config["recipe_dir"]
             )
+        elif vendored:
+            get_fast_finish_script += "cat .ci_support/ff_ci_pr_build.py"
         else:
             get_fast_finish_script += "curl https://raw.githubusercontent.com/conda-forge/conda-forge-ci-setup-feedstock/{branch}/recipe/conda_forge_ci_setup/ff_ci_pr_build.py"  # NOQA
 
@@ -463,6 +1043,52 @@ def _get_fast_finish_script(
     return fast_finish_text
 
 
+def vendor_fast_finish_script(forge_config, forge_dir):
+    """Vendor the upstream ff_ci_pr_build.py into .ci_support if the feedstock asks for
+    it, and remove a copy that is no longer used otherwise.
+
+    The script is downloaded unchanged from ``FAST_FINISH_SCRIPT_URL`` at the commit given
+    by the option, which is recorded next to the copy.  It is only downloaded again when
+    the option names another commit or the copy is missing.  When it cannot be downloaded
+    the vendored copy is kept, or the CI jobs download the script themselves if there is
+    none.
+    """
+    import requests
+
+    target = _vendored_fast_finish_script(forge_dir)
+    ref_file = _vendored_fast_finish_ref(forge_dir)
+    ref = forge_config["vendor_fast_finish_script"]
+    if not ref:
+        for fname in (target, ref_file):
+            if os.path.exists(fname):
+                remove_file(fname)
+        return
+
+    if os.path.exists(target) and os.path.exists(ref_file):
+        with open(ref_file) as fh:
+            if fh.read().strip() == ref:
+                return
+
+    url = FAST_FINISH_SCRIPT_URL.format(ref=ref)
+    try:
+        resp = requests.get(url, timeout=30)
+        resp.raise_for_status()
+    except requests.RequestException as e:
+        logger.warning(
+            "Cannot download the fast finish script from %s, %s: %s",
+            url,
+            "keeping the vendored copy"
+            if os.path.exists(target)
+            else "the CI jobs download it themselves",
+            e,
+        )
+        return
+    with write_file(target) as fh:
+        fh.write(resp.text)
+    with write_file(ref_file) as fh:
+        fh.write(ref + "\n")
+
+
 def migrate_combined_spec(combined_spec, forge_dir, config):
     """CFEP-9 variant migrations
 
@@ -510,7 +1136,10 @@ def _render_ci_provider(
     keep_noarchs=None,
     extra_platform_files={},
     upload_packages=[],
+    context=None,
 ):
+    if context is None:
+        context = RenderContext()
     if keep_noarchs is None:
         keep_noarchs = [False] * len(platforms)
 
@@ -519,35 +1148,13 @@ def _render_ci_provider(
     for i, (platform, arch, keep_noarch) in enumerate(
         zip(platforms, archs, keep_noarchs)
     ):
-        config = conda_build.config.get_or_merge_config(None,
-            exclusive_config_file=forge_config["exclusive_config_file"],
-            platform=platform,
-            arch=arch,
-        )
-
-        # Get the combined variants from normal variant locations prior to running migrations
-        combined_variant_spec, _ = conda_build.variants.get_package_combined_spec(
-            os.path.join(forge_dir, "recipe"),
-            config=config
-        )
-
-        migrated_combined_variant_spec = migrate_combined_spec(combined_variant_spec, forge_dir, config)
-
-        metas = conda_build.api.render(
-            os.path.join(forge_dir, "recipe"),
-            platform=platform,
-            arch=arch,
-            ignore_system_variants=True,
-            variants=migrated_combined_variant_spec,
-            permit_undefined_jinja=True,
-            finalize=False,
-            bypass_env_check=True,
-            channel_urls=forge_config.get("channels", {}).get("sources", []),
+        metas = list(
+            context.cached_render(
+                (forge_dir, platform, arch),
+                lambda: _render_recipe(forge_config, forge_dir, platform, arch, context),
+            )
         )
 
-        # render returns some download & reparsing info that we don't care about
-        metas = [m for m, _, _ in metas]
-
         if not keep_noarch:
             to_delete = []
             for idx, meta in enumerate(metas):
@@ -596,7 +1203,13 @@ def _render_ci_provider(
             if enable:
                 configs.extend(
                     dump_subspace_config_files(
-                        metas, forge_dir, platform, arch, upload, forge_config
+                        metas,
+                        forge_dir,
+                        platform,
+                        arch,
+                        upload,
+                        forge_config,
+                        context=context,
                     )
                 )
 
@@ -623,6 +1236,14 @@ def _render_ci_provider(
 
         forge_config["configs"] = configs
 
+        if forge_config["conda_pkgs_cache"]:
+            forge_config["conda_pkgs_cache_keys"] = {
+                config_name: conda_pkgs_cache_key(
+                    forge_dir, [config_name], _setup_packages(forge_config)
+                )
+                for config_name, _, _, _ in configs
+            }
+
         forge_config["fast_finish"] = _get_fast_finish_script(
             provider_name,
             forge_dir=forge_dir,
@@ -664,21 +1285,55 @@ def _render_ci_provider(
                     forge_dir=forge_dir,
                     forge_config=forge_config,
                     platform=platform,
+                    context=context,
                 )
 
-        template = jinja_env.get_template(platform_template_file)
-        with write_file(platform_target_path) as fh:
-            fh.write(template.render(**forge_config))
-
     # circleci needs a placeholder file of sorts - always write the output, even if no metas
-    if provider_name == "circle":
+    if any(enable_platform) or provider_name == "circle":
         template = jinja_env.get_template(platform_template_file)
-        with write_file(platform_target_path) as fh:
-            fh.write(template.render(**forge_config))
+        with context.phase("render_templates"):
+            with write_file(platform_target_path) as fh:
+                template.stream(**forge_config).dump(fh)
     # TODO: azure-pipelines might need the same as circle
     return forge_config
 
 
+def _render_recipe(forge_config, forge_dir, platform, arch, context):
+    with context.phase("load_variants"), conda_build_session(forge_config):
+        config = conda_build.config.get_or_merge_config(None,
+            exclusive_config_file=forge_config["exclusive_config_file"],
+            platform=platform,
+            arch=arch,
+        )
+
+        # Get the combined variants from normal variant locations prior to running migrations
+        with cached_pinning(forge_config, context.pinning_cache):
+            combined_variant_spec, _ = conda_build.variants.get_package_combined_spec(
+                os.path.join(forge_dir, "recipe"),
+                config=config
+            )
+
+        migrated_combined_variant_spec = migrate_combined_spec(combined_variant_spec, forge_dir, config)
+
+    with context.phase("conda_build.render"), conda_build_session(
+        forge_config
+    ), cached_pinning(forge_config, context.pinning_cache):
+        metas = conda_build.api.render(
+            os.path.join(forge_dir, "recipe"),
+            platform=platform,
+            arch=arch,
+            ignore_system_variants=True,
+            variants=migrated_combined_variant_spec,
+            permit_undefined_jinja=True,
+            finalize=False,
+            bypass_env_check=True,
+            channel_urls=forge_config.get("channels", {}).get("sources", []),
+        )
+
+    # render returns some download & reparsing info that we don't care about
+    return [m for m, _, _ in metas]
+
+
 def _get_build_setup_line(forge_dir, platform, forge_config):
     # If the recipe supplies its own run_conda_forge_build_setup script_linux,
     # we use it instead of the global one.
@@ -741,7 +1396,9 @@ def _get_build_setup_line(forge_dir, platform, forge_config):
     return build_setup
 
 
-def _circle_specific_setup(jinja_env, forge_config, forge_dir, platform):
+def _circle_specific_setup(
+    jinja_env, forge_config, forge_dir, platform, context=None
+):
 
     if platform == "linux":
         yum_build_setup = generate_yum_requirements(forge_dir)
@@ -769,6 +1426,7 @@ def _circle_specific_setup(jinja_env, forge_config, forge_dir, platform):
         target_dir=os.path.join(forge_dir, ".circleci"),
         jinja_env=jinja_env,
         template_files=template_files,
+        context=context,
     )
 
     # Fix permission of other shell files.
@@ -850,7 +1508,7 @@ def _get_platforms_of_provider(provider, forge_config):
     return platforms, archs, keep_noarchs, upload_packages
 
 
-def render_circle(jinja_env, forge_config, forge_dir):
+def render_circle(jinja_env, forge_config, forge_dir, context=None):
     target_path = os.path.join(forge_dir, ".circleci", "config.yml")
     template_filename = "circle.yml.tmpl"
     fast_finish_text = textwrap.dedent(
@@ -889,10 +1547,13 @@ def render_circle(jinja_env, forge_config, forge_dir):
         keep_noarchs=keep_noarchs,
         extra_platform_files=extra_platform_files,
         upload_packages=upload_packages,
+        context=context,
     )
 
 
-def _travis_specific_setup(jinja_env, forge_config, forge_dir, platform):
+def _travis_specific_setup(
+    jinja_env, forge_config, forge_dir, platform, context=None
+):
     build_setup = _get_build_setup_line(forge_dir, platform, forge_config)
 
     platform_templates = {
@@ -917,6 +1578,7 @@ def _travis_specific_setup(jinja_env, forge_config, forge_dir, platform):
         target_dir=os.path.join(forge_dir, ".travis"),
         jinja_env=jinja_env,
         template_files=template_files,
+        context=context,
     )
 
     build_setup = build_setup.strip()
@@ -925,18 +1587,21 @@ def _travis_specific_setup(jinja_env, forge_config, forge_dir, platform):
 
 
 def _render_template_exe_files(
-    forge_config, target_dir, jinja_env, template_files
+    forge_config, target_dir, jinja_env, template_files, context=None
 ):
+    if context is None:
+        context = RenderContext()
     for template_file in template_files:
         template = jinja_env.get_template(template_file)
         target_fname = os.path.join(target_dir, template_file[: -len(".tmpl")])
-        with write_file(target_fname) as fh:
-            fh.write(template.render(**forge_config))
+        with context.phase("render_templates"):
+            with write_file(target_fname) as fh:
+                template.stream(**forge_config).dump(fh)
         # Fix permission of template shell files
         set_exe_file(target_fname, True)
 
 
-def render_travis(jinja_env, forge_config, forge_dir):
+def render_travis(jinja_env, forge_config, forge_dir, context=None):
     target_path = os.path.join(forge_dir, ".travis.yml")
     template_filename = "travis.yml.tmpl"
     fast_finish_text = textwrap.dedent(
@@ -972,10 +1637,13 @@ def render_travis(jinja_env, forge_config, forge_dir):
         platform_specific_setup=_travis_specific_setup,
         upload_packages=upload_packages,
         extra_platform_files=extra_platform_files,
+        context=context,
     )
 
 
-def _appveyor_specific_setup(jinja_env, forge_config, forge_dir, platform):
+def _appveyor_specific_setup(
+    jinja_env, forge_config, forge_dir, platform, context=None
+):
     build_setup = _get_build_setup_line(forge_dir, platform, forge_config)
     build_setup = build_setup.rstrip()
     new_build_setup = ""
@@ -989,7 +1657,7 @@ def _appveyor_specific_setup(jinja_env, forge_config, forge_dir, platform):
     forge_config["build_setup"] = build_setup
 
 
-def render_appveyor(jinja_env, forge_config, forge_dir):
+def render_appveyor(jinja_env, forge_config, forge_dir, context=None):
     target_path = os.path.join(forge_dir, ".appveyor.yml")
     fast_finish_text = textwrap.dedent(
         """\
@@ -1016,10 +1684,143 @@ def render_appveyor(jinja_env, forge_config, forge_dir):
         keep_noarchs=keep_noarchs,
         platform_specific_setup=_appveyor_specific_setup,
         upload_packages=upload_packages,
+        context=context,
+    )
+
+
+def _load_job_durations(history_file):
+    """Read the duration history of the CI jobs, a mapping of config names to the minutes
+    their builds took.  A list of minutes counts with its longest duration."""
+    if not os.path.exists(history_file):
+        warnings.warn(
+            "Job duration history {} not found, no jobs are packed.".format(history_file)
+        )
+        return {}
+    with open(history_file) as fh:
+        history = yaml.safe_load(fh) or {}
+    durations = {}
+    for config_name, minutes in history.items():
+        if isinstance(minutes, (list, tuple)):
+            minutes = max(minutes) if minutes else None
+        if minutes is not None:
+            durations[config_name] = float(minutes)
+    return durations
+
+
+def pack_configs(config_names, durations, max_minutes):
+    """Pack configs into as few jobs as possible that take at most ``max_minutes`` each.
+
+    The packing is the first fit decreasing heuristic over the known ``durations`` of the
+    configs.  Configs without a known duration, or that take longer than ``max_minutes``
+    on their own, keep a job of their own.  Returns a list of lists of config names.
+    """
+    jobs = []
+    loads = []
+    known = [name for name in config_names if name in durations]
+    for name in sorted(known, key=lambda name: (-durations[name], name)):
+        for i, load in enumerate(loads):
+            if load + durations[name] <= max_minutes:
+                jobs[i].append(name)
+                loads[i] += durations[name]
+                break
+        else:
+            jobs.append([name])
+            loads.append(durations[name])
+    jobs.extend([name] for name in config_names if name not in durations)
+    return sorted(sorted(job) for job in jobs)
+
+
+def _pack_azure_jobs(forge_config, forge_dir):
+    """The linux jobs of the azure matrix with ``azure: job_packing`` enabled.
+
+    Only configs that share the target platform, docker image and upload setting can run
+    one after the other in one job.
+    """
+    job_packing = forge_config["azure"].get("job_packing")
+    if not job_packing:
+        return None
+    if not isinstance(job_packing, dict):
+        job_packing = {}
+    history_file = os.path.join(
+        forge_dir, job_packing.get("history", "ci_durations.yml")
     )
+    max_minutes = float(job_packing.get("max_minutes", 30))
+    durations = _load_job_durations(history_file)
+
+    groups = OrderedDict()
+    for config_name, platform, upload, config in sorted(forge_config["configs"]):
+        if not platform.startswith("linux"):
+            continue
+        key = (platform, config["docker_image"][-1], upload)
+        groups.setdefault(key, []).append(config_name)
+
+    packed_jobs = []
+    for (platform, docker_image, upload), config_names in groups.items():
+        for job in pack_configs(config_names, durations, max_minutes):
+            name = job[0]
+            if len(job) > 1:
+                name = "{}_and_{}_more".format(name, len(job) - 1)
+            packed_job = {
+                "name": name,
+                "configs": job,
+                "upload": upload,
+                "docker_image": docker_image,
+            }
+            if forge_config["conda_pkgs_cache"]:
+                packed_job["cache_key"] = conda_pkgs_cache_key(
+                    forge_dir, job, _setup_packages(forge_config)
+                )
+            packed_jobs.append(packed_job)
+    return sorted(packed_jobs, key=lambda job: job["name"])
 
 
-def _azure_specific_setup(jinja_env, forge_config, forge_dir, platform):
+def _azure_matrix_jobs(forge_config, platform, packed_jobs=None):
+    """The matrix of the azure jobs of ``platform``, for the job templates.
+
+    Only the names of the jobs are passed, a job builds the config of its name with the
+    default variables of the template.  The variables that differ from those, like the
+    configs of packed jobs or the image of a config, are overrides of the job.
+    """
+    cache_keys = forge_config.get("conda_pkgs_cache_keys", {})
+    default_image = forge_config["docker"]["fallback_image"]
+    if packed_jobs is None:
+        packed_jobs = [
+            {
+                "name": config_name,
+                "configs": [config_name],
+                "upload": upload,
+                "docker_image": config.get("docker_image", [default_image])[-1],
+                "cache_key": cache_keys.get(config_name),
+            }
+            for config_name, config_platform, upload, config in sorted(
+                forge_config["configs"]
+            )
+            if config_platform.startswith(platform)
+        ]
+
+    names = []
+    overrides = OrderedDict()
+    for job in packed_jobs:
+        variables = OrderedDict()
+        if job["configs"] != [job["name"]]:
+            variables["CONFIG"] = job["configs"][0]
+            variables["CONFIGS"] = " ".join(job["configs"])
+        if not job["upload"]:
+            variables["UPLOAD_PACKAGES"] = str(job["upload"])
+        if job["docker_image"] != default_image:
+            variables["DOCKER_IMAGE"] = job["docker_image"]
+        if forge_config["conda_pkgs_cache"]:
+            # the key of every job differs, it hashes the configs of the job
+            variables["CONDA_PKGS_CACHE_KEY"] = job["cache_key"]
+        names.append(job["name"])
+        if variables:
+            overrides[job["name"]] = variables
+    return OrderedDict([("configs", names), ("overrides", overrides)])
+
+
+def _azure_specific_setup(
+    jinja_env, forge_config, forge_dir, platform, context=None
+):
     platform_templates = {
         "linux": [
             "azure-pipelines-linux.yml.tmpl",
@@ -1041,15 +1842,30 @@ def _azure_specific_setup(jinja_env, forge_config, forge_dir, platform):
 
     forge_config["build_setup"] = build_setup
 
+    template_config = forge_config
+    packed_jobs = None
+    if platform == "linux":
+        packed_jobs = _pack_azure_jobs(forge_config, forge_dir)
+        if packed_jobs is not None:
+            # only the azure templates know about packed jobs
+            template_config = dict(forge_config, packed_jobs=packed_jobs)
+
+    if forge_config["azure"].get("compact_matrix"):
+        # passed to the job templates by azure-pipelines.yml
+        forge_config.setdefault("azure_matrix", {})[platform] = _azure_matrix_jobs(
+            forge_config, platform, packed_jobs
+        )
+
     _render_template_exe_files(
-        forge_config=forge_config,
+        forge_config=template_config,
         target_dir=os.path.join(forge_dir, ".azure-pipelines"),
         jinja_env=jinja_env,
         template_files=template_files,
+        context=context,
     )
 
 
-def render_azure(jinja_env, forge_config, forge_dir):
+def render_azure(jinja_env, forge_config, forge_dir, context=None):
     target_path = os.path.join(forge_dir, "azure-pipelines.yml")
     template_filename = "azure-pipelines.yml.tmpl"
     fast_finish_text = ""
@@ -1072,10 +1888,13 @@ def render_azure(jinja_env, forge_config, forge_dir):
         platform_specific_setup=_azure_specific_setup,
         keep_noarchs=keep_noarchs,
         upload_packages=upload_packages,
+        context=context,
     )
 
 
-def _drone_specific_setup(jinja_env, forge_config, forge_dir, platform):
+def _drone_specific_setup(
+    jinja_env, forge_config, forge_dir, platform, context=None
+):
     platform_templates = {
         "linux": [
             "build_steps.sh.tmpl",
@@ -1100,10 +1919,11 @@ def _drone_specific_setup(jinja_env, forge_config, forge_dir, platform):
         target_dir=os.path.join(forge_dir, ".drone"),
         jinja_env=jinja_env,
         template_files=template_files,
+        context=context,
     )
 
 
-def render_drone(jinja_env, forge_config, forge_dir):
+def render_drone(jinja_env, forge_config, forge_dir, context=None):
     target_path = os.path.join(forge_dir, ".drone.yml")
     template_filename = "drone.yml.tmpl"
     fast_finish_text = ""
@@ -1126,21 +1946,54 @@ def render_drone(jinja_env, forge_config, forge_dir):
         platform_specific_setup=_drone_specific_setup,
         keep_noarchs=keep_noarchs,
         upload_packages=upload_packages,
+        context=context,
     )
 
-def render_README(jinja_env, forge_config, forge_dir):
+def _render_readme_recipe(forge_config, forge_dir, context):
+    def _render():
+        with context.phase("conda_build.render"), conda_build_session(
+            forge_config
+        ), cached_pinning(forge_config, context.pinning_cache):
+            return conda_build.api.render(
+                os.path.join(forge_dir, "recipe"),
+                exclusive_config_file=forge_config["exclusive_config_file"],
+                permit_undefined_jinja=True,
+                finalize=False,
+                bypass_env_check=True,
+                trim_skip=False,
+            )
+
+    return context.cached_render((forge_dir, "README"), _render)
+
+
+def _prerender_recipe(forge_config, forge_dir, context):
+    """Render the recipe for every CI platform and the README without writing any file.
+
+    The renders are left on the context for ``_render_feedstock_files`` to reuse, which
+    lets them overlap the network checks that have to pass before the feedstock is touched.
+    """
+    keys = OrderedDict()
+    for provider in ["circle", "travis", "appveyor", "azure", "drone"]:
+        platforms, archs, _, _ = _get_platforms_of_provider(provider, forge_config)
+        for platform, arch in zip(platforms, archs):
+            keys[(platform, arch)] = None
+    for platform, arch in keys:
+        context.cached_render(
+            (forge_dir, platform, arch),
+            lambda: _render_recipe(forge_config, forge_dir, platform, arch, context),
+        )
+    if "README.md" not in forge_config["skip_render"]:
+        _render_readme_recipe(forge_config, forge_dir, context)
+
+
+def render_README(jinja_env, forge_config, forge_dir, context=None):
     if "README.md" in forge_config["skip_render"]:
         logger.info("README.md rendering is skipped")
         return
+    if context is None:
+        context = RenderContext()
     # we only care about the first metadata object for sake of readme
-    metas = conda_build.api.render(
-        os.path.join(forge_dir, "recipe"),
-        exclusive_config_file=forge_config["exclusive_config_file"],
-        permit_undefined_jinja=True,
-        finalize=False,
-        bypass_env_check=True,
-        trim_skip=False,
-    )
+    metas = _render_readme_recipe(forge_config, forge_dir, context)
 
     if "parent_recipe" in metas[0][0].meta["extra"]:
         package_name = metas[0][0].meta["extra"]["parent_recipe"]["name"]
@@ -1174,26 +2027,30 @@ def render_README(jinja_env, forge_config, forge_dir):
     )
 
     if forge_config['azure'].get('build_id') is None:
-        # Try to retrieve the build_id from the interwebs
-        try:
-            import requests
-            resp = requests.get(
-                "https://dev.azure.com/{org}/{project_name}/_apis/build/definitions?name={repo}".format(
-                    org=forge_config["azure"]["user_or_org"],
-                    project_name=forge_config["azure"]["project_name"],
-                    repo=forge_config["github"]["repo_name"]
-                ))
-            resp.raise_for_status()
-            build_def = resp.json()["value"][0]
-            forge_config['azure']['build_id'] = build_def['id']
-        except (IndexError, IOError):
-            pass
+        # the rerender may have started the lookup already
+        if context.azure_build_id is not None:
+            try:
+                build_id = context.azure_build_id.result(
+                    timeout=azure_build_ids.LOOKUP_TIMEOUT
+                )
+            except FutureTimeoutError:
+                # a hanging azure does not hold up the rerender
+                build_id = None
+        else:
+            build_id = azure_build_ids.get_build_id(
+                forge_config["azure"]["user_or_org"],
+                forge_config["azure"]["project_name"],
+                forge_config["github"]["repo_name"],
+            )
+        if build_id is not None:
+            forge_config['azure']['build_id'] = build_id
 
     logger.debug("README")
     logger.debug(yaml.dump(forge_config))
 
-    with write_file(target_fname) as fh:
-        fh.write(template.render(**forge_config))
+    with context.phase("render_templates"):
+        with write_file(target_fname) as fh:
+            template.stream(**forge_config).dump(fh)
 
     if len(forge_config["maintainers"]) > 0:
         code_owners_file = os.path.join(forge_dir, ".github", "CODEOWNERS")
@@ -1219,6 +2076,8 @@ def _load_forge_config(forge_dir, exclusive_config_file):
             "executable": "docker",
             "fallback_image": "condaforge/linux-anvil-comp7",
             "command": "bash",
+            # Keep the docker image of the CI jobs between runs
+            "image_cache": False,
         },
         "templates": {},
         "drone": {},
@@ -1234,7 +2093,10 @@ def _load_forge_config(forge_dir, exclusive_config_file):
             "project_name": "feedstock-builds",
             "project_id": "84710dde-1620-425b-80d0-4cf5baca359d",
             # Default to a timeout of 6 hours.  This is the maximum for azure by default
-            "timeout_minutes": 360
+            "timeout_minutes": 360,
+            # Pass the matrix to one parameterized job template per platform instead of
+            #     expanding it in the job templates
+            "compact_matrix": False,
         },
         "provider": {
             "linux": "azure",
@@ -1271,7 +2133,16 @@ def _load_forge_config(forge_dir, exclusive_config_file):
             "branch_name": "master",
         },
         "recipe_dir": "recipe",
-        "skip_render": []
+        "skip_render": [],
+        # Keep the conda package cache of the CI jobs between runs
+        "conda_pkgs_cache": False,
+        # Solver for the environments of the CI jobs, one of CONDA_SOLVERS
+        "conda_solver": "conda",
+        # Run a copy of ff_ci_pr_build.py in .ci_support instead of downloading it, the
+        #     commit of conda-forge-ci-setup-feedstock to take it from
+        "vendor_fast_finish_script": False,
+        # Stop the CI jobs of pull requests early if they do not affect their configs
+        "skip_unchanged_configs": False,
     }
 
     # An older conda-smithy used to have some files which should no longer exist,
@@ -1331,6 +2202,28 @@ def _load_forge_config(forge_dir, exclusive_config_file):
     # Set some more azure defaults
     config["azure"].setdefault("user_or_org", config["github"]["user_or_org"])
 
+    if config["conda_solver"] not in CONDA_SOLVERS:
+        raise ValueError(
+            "conda_solver must be one of {}, not {!r}.".format(
+                ", ".join(sorted(CONDA_SOLVERS)), config["conda_solver"]
+            )
+        )
+    fast_finish_ref = config["vendor_fast_finish_script"]
+    if fast_finish_ref is not False and not (
+        isinstance(fast_finish_ref, str) and _commit_ref_pat.match(fast_finish_ref)
+    ):
+        raise ValueError(
+            "vendor_fast_finish_script must be the hexadecimal commit of "
+            "conda-forge-ci-setup-feedstock to vendor ff_ci_pr_build.py from, "
+            "not {!r}.".format(fast_finish_ref)
+        )
+    solver_packages, install_tool, build_subcommand = CONDA_SOLVERS[
+        config["conda_solver"]
+    ]
+    config["conda_solver_packages"] = " ".join(solver_packages)
+    config["conda_install_tool"] = install_tool
+    config["conda_build_subcommand"] = build_subcommand
+
     log = yaml.safe_dump(config)
     logger.debug("## CONFIGURATION USED\n")
     logger.debug(log)
@@ -1347,14 +2240,6 @@ def _load_forge_config(forge_dir, exclusive_config_file):
         if config["provider"][platform] in {"default", "emulated"}:
             config["provider"][platform] = "azure"
 
-    # Set the environment variable for the compiler stack
-    os.environ["CF_COMPILER_STACK"] = config["compiler_stack"]
-    # Set valid ranger for the supported platforms
-    os.environ["CF_MIN_PY_VER"] = config["min_py_ver"]
-    os.environ["CF_MAX_PY_VER"] = config["max_py_ver"]
-    os.environ["CF_MIN_R_VER"] = config["min_r_ver"]
-    os.environ["CF_MAX_R_VER"] = config["max_r_ver"]
-
     config["package"] = os.path.basename(forge_dir)
     if not config["github"]["repo_name"]:
         feedstock_name = os.path.basename(forge_dir)
@@ -1428,15 +2313,20 @@ def get_cfp_file_path(resolve=None, error_on_warn=True):
         )
         resolve = conda_build.conda_interface.Resolve(index)
 
+    cf_pinning_file, cf_pinning_ver = _get_installed_cfp_file_path()
+    check_version_uptodate(
+        resolve, "conda-forge-pinning", cf_pinning_ver, error_on_warn
+    )
+    return cf_pinning_file, cf_pinning_ver
+
+
+def _get_installed_cfp_file_path():
+    """The pinning file and version of the installed conda-forge-pinning, no network needed."""
     installed_vers = conda_build.conda_interface.get_installed_version(
         conda_build.conda_interface.root_dir, ["conda-forge-pinning"]
     )
     cf_pinning_ver = installed_vers["conda-forge-pinning"]
-    if cf_pinning_ver:
-        check_version_uptodate(
-            resolve, "conda-forge-pinning", cf_pinning_ver, error_on_warn
-        )
-    else:
+    if not cf_pinning_ver:
         raise RuntimeError(
             "Install conda-forge-pinning or edit conda-forge.yml"
         )
@@ -1461,16 +2351,70 @@ def clear_variants(forge_dir):
             remove_file(config)
 
 
+def _get_resolve(context):
+    # loading the channel index is slow, a context that is reused for several rerenders
+    #     only loads it once
+    if context.resolve is not None:
+        return context.resolve
+    # the download does not hold up the renders, only installing the index takes their lock
+    index = conda_build.conda_interface.get_index(channel_urls=["conda-forge"])
+    resolve = conda_build.conda_interface.Resolve(index)
+    with _conda_build_lock:
+        if context.resolve is None:
+            context.resolve = resolve
+        return context.resolve
+
+
+# runs the network bound steps of rerenders in the background
+_network_executor = ThreadPoolExecutor(
+    max_workers=4, thread_name_prefix="smithy-network"
+)
+
+
+def _check_versions_uptodate(context, installed_versions, error_on_warn):
+    r = _get_resolve(context)
+    for name, installed_version in installed_versions:
+        check_version_uptodate(r, name, installed_version, error_on_warn)
+
+
 def main(
-    forge_file_directory, no_check_uptodate=False, commit=False, exclusive_config_file=None, check=False
+    forge_file_directory, no_check_uptodate=False, commit=False, exclusive_config_file=None, check=False,
+    memory_profile=False, memory_limit=None, context=None, io_stats=False,
 ):
     import logging
     loglevel = os.environ.get('CONDA_SMITHY_LOGLEVEL', 'INFO').upper()
     logger.setLevel(loglevel)
 
+    profiler = None
+    if memory_profile or memory_limit:
+        profiler = memory_profiling.MemoryProfiler(limit=memory_limit)
+    if context is None:
+        context = RenderContext()
+    context.profiler = profiler
+    io_stats_baseline = feedstock_io.io_stats.snapshot() if io_stats else None
+    try:
+        with memory_profiling.profiling(profiler):
+            return _rerender(
+                forge_file_directory,
+                no_check_uptodate=no_check_uptodate,
+                commit=commit,
+                exclusive_config_file=exclusive_config_file,
+                check=check,
+                context=context,
+            )
+    finally:
+        # a MemoryLimitExceeded error already carries the report
+        if profiler is not None and profiler.exceeded is None:
+            logger.info(profiler.report())
+        if io_stats_baseline is not None:
+            logger.info(feedstock_io.io_stats.report(since=io_stats_baseline))
+
+
+def _rerender(
+    forge_file_directory, no_check_uptodate, commit, exclusive_config_file, check, context
+):
     if check:
-        index = conda_build.conda_interface.get_index(channel_urls=["conda-forge"])
-        r = conda_build.conda_interface.Resolve(index)
+        r = _get_resolve(context)
 
         # Check that nwb-extensions-smithy is up-to-date
         check_version_uptodate(r, "nwb-extensions-smithy", __version__, True)
@@ -1478,12 +2422,6 @@ def main(
         return True
 
     error_on_warn = False if no_check_uptodate else True
-    index = conda_build.conda_interface.get_index(channel_urls=["conda-forge"])
-    r = conda_build.conda_interface.Resolve(index)
-
-    # Check that nwb-extensions-smithy is up-to-date
-    check_version_uptodate(r, "nwb-extensions-smithy", __version__, error_on_warn)
-
     forge_dir = os.path.abspath(forge_file_directory)
 
     if exclusive_config_file is not None:
@@ -1492,11 +2430,34 @@ def main(
             raise RuntimeError("Given exclusive-config-file not found.")
         cf_pinning_ver = None
     else:
-        exclusive_config_file, cf_pinning_ver = get_cfp_file_path(
-            r, error_on_warn
-        )
+        exclusive_config_file, cf_pinning_ver = _get_installed_cfp_file_path()
 
-    config = _load_forge_config(forge_dir, exclusive_config_file)
+    # Check that nwb-extensions-smithy and the pinning are up-to-date
+    installed_versions = [("nwb-extensions-smithy", __version__)]
+    if cf_pinning_ver:
+        installed_versions.append(("conda-forge-pinning", cf_pinning_ver))
+
+    # The network bound steps run in the background.  The version checks overlap loading
+    #     the forge config and rendering the recipe, and are awaited before any file is
+    #     written.  The azure build id lookup overlaps the whole rerender.
+    uptodate = _network_executor.submit(
+        _check_versions_uptodate, context, installed_versions, error_on_warn
+    )
+
+    with context.phase("load_forge_config"):
+        config = _load_forge_config(forge_dir, exclusive_config_file)
+
+    context.azure_build_id = None
+    if (
+        config["azure"].get("build_id") is None
+        and "README.md" not in config["skip_render"]
+    ):
+        context.azure_build_id = _network_executor.submit(
+            azure_build_ids.get_build_id,
+            config["azure"]["user_or_org"],
+            config["azure"]["project_name"],
+            config["github"]["repo_name"],
+        )
 
     for each_ci in ["travis", "circle", "appveyor", "drone"]:
         if config[each_ci].pop("enabled", None):
@@ -1517,25 +2478,16 @@ def main(
         ),
     )
 
-    copy_feedstock_content(config, forge_dir)
-    set_exe_file(os.path.join(forge_dir, "build-locally.py"))
-    clear_variants(forge_dir)
+    with context.holding_renders():
+        _prerender_recipe(config, forge_dir, context)
 
-    render_circle(env, config, forge_dir)
-    render_travis(env, config, forge_dir)
-    render_appveyor(env, config, forge_dir)
-    render_azure(env, config, forge_dir)
-    render_drone(env, config, forge_dir)
-    render_README(env, config, forge_dir)
+        # an out-of-date smithy or pinning fails the rerender before it touches the
+        #     feedstock
+        uptodate.result()
 
-    if os.path.isdir(os.path.join(forge_dir, ".ci_support")):
-        with write_file(os.path.join(forge_dir, ".ci_support", "README")) as f:
-            f.write(
-                "This file is automatically generated by conda-smithy.  To change "
-                "any matrix elements, you should change conda-smithy's input "
-                "conda_build_config.yaml and re-render the recipe, rather than editing "
-                "these files directly."
-            )
+        # all the files of the rerender are staged with a single write of the git index
+        with index_session(forge_dir):
+            _render_feedstock_files(env, config, forge_dir, context)
 
     commit_changes(
         forge_file_directory,
@@ -1546,6 +2498,38 @@ def main(
     )
 
 
+def _render_feedstock_files(env, config, forge_dir, context):
+    with context.phase("copy_feedstock_content"):
+        copy_feedstock_content(config, forge_dir)
+        set_exe_file(os.path.join(forge_dir, "build-locally.py"))
+        clear_variants(forge_dir)
+        vendor_fast_finish_script(config, forge_dir)
+
+    with context.phase("render_circle"):
+        render_circle(env, config, forge_dir, context=context)
+    with context.phase("render_travis"):
+        render_travis(env, config, forge_dir, context=context)
+    with context.phase("render_appveyor"):
+        render_appveyor(env, config, forge_dir, context=context)
+    with context.phase("render_azure"):
+        render_azure(env, config, forge_dir, context=context)
+    with context.phase("render_drone"):
+        render_drone(env, config, forge_dir, context=context)
+    with context.phase("render_README"):
+        render_README(env, config, forge_dir, context=context)
+
+    write_dependency_manifest(config, forge_dir)
+
+    if os.path.isdir(os.path.join(forge_dir, ".ci_support")):
+        with write_file(os.path.join(forge_dir, ".ci_support", "README")) as f:
+            f.write(
+                "This file is automatically generated by conda-smithy.  To change "
+                "any matrix elements, you should change conda-smithy's input "
+                "conda_build_config.yaml and re-render the recipe, rather than editing "
+                "these files directly."
+            )
+
+
 if __name__ == "__main__":
     import argparse
 
@@ -1560,5 +2544,49 @@ if __name__ == "__main__":
         ),
     )
 
+    parser.add_argument(
+        "--memory-profile",
+        action="store_true",
+        help="Report peak RSS and the top allocators for each rerender phase.",
+    )
+    parser.add_argument(
+        "--memory-limit",
+        default=None,
+        help=(
+            "Abort the rerender with a memory report once the process uses more "
+            "than this much memory, e.g. 4G."
+        ),
+    )
+
+    parser.add_argument(
+        "--io-stats",
+        action="store_true",
+        help="Report the files, bytes and git operations of the rerender.",
+    )
+
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help=(
+            "Keep running and rerender whenever the recipe, conda-forge.yml, the "
+            "templates or the migrations change."
+        ),
+    )
+
     args = parser.parse_args()
-    main(args.forge_file_directory)
+    if args.watch:
+        from .watch import watch
+
+        watch(
+            args.forge_file_directory,
+            memory_profile=args.memory_profile,
+            memory_limit=args.memory_limit,
+            io_stats=args.io_stats,
+        )
+    else:
+        main(
+            args.forge_file_directory,
+            memory_profile=args.memory_profile,
+            memory_limit=args.memory_limit,
+            io_stats=args.io_stats,
+        )
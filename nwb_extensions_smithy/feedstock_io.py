@@ -1,35 +1,339 @@
+import codecs
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+import filecmp
 import io
 import os
 import shutil
 import stat
+import sys
+import threading
+import time
 
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
 
-def get_repo(path, search_parent_directories=True):
-    repo = None
+try:
+    import git
+except ImportError:
+    git = None
+
+
+class IOStats(object):
+    """Counters and timers of the file and git operations of this module.
+
+    Every operation counts its calls and the seconds spent in it, under its name, and may
+    add the bytes it wrote.  The writes of the git index and the git subprocesses they
+    cause are counted as well.  ``io_stats`` counts everything done in the process;
+    ``snapshot`` and ``report(since=...)`` give what a single command did.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+    def add(self, name, value=1):
+        with self._lock:
+            self._counts[name] += value
+
+    @contextmanager
+    def timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._counts[name + ".calls"] += 1
+                self._counts[name + ".seconds"] += time.perf_counter() - start
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def report(self, since=None):
+        counts = Counter(self.snapshot())
+        counts.subtract(since or {})
+        lines = [
+            "File and git operations",
+            "{:<24} {:>8} {:>10} {:>14}".format("operation", "calls", "seconds", "bytes"),
+        ]
+        names = sorted(set(k.rsplit(".", 1)[0] for k in counts if k.endswith(".calls")))
+        for name in names:
+            if not counts[name + ".calls"]:
+                continue
+            lines.append(
+                "{:<24} {:>8} {:>10.3f} {:>14}".format(
+                    name,
+                    counts[name + ".calls"],
+                    counts[name + ".seconds"],
+                    counts[name + ".bytes"],
+                )
+            )
+        for name, label in [
+            ("copy_file.skipped", "identical files not copied"),
+            ("get_repo.cache_hits", "cached repository lookups"),
+            ("git.index_writes", "git index writes"),
+            ("git.subprocesses", "git subprocesses"),
+        ]:
+            lines.append("{:<44} {:>14}".format(label, counts[name]))
+        return "\n".join(lines)
+
+    def write_report(self, since=None, file=None):
+        """Write the report to ``file``, stderr by default to keep it out of the output."""
+        print(self.report(since=since), file=sys.stderr if file is None else file)
+
+
+io_stats = IOStats()
+
+
+# directory -> (repository root or None, inode of its .git), least recently used first
+_repo_roots = OrderedDict()
+_repo_cache_size = 256
+_repo_cache_lock = threading.Lock()
+# repository root -> (git.Repo, inode of its .git), per thread since a git.Repo and the
+#     git processes it keeps are not safe to share between threads
+_thread_repos = threading.local()
+
+
+def _git_inode(directory):
     try:
-        import git
+        return os.stat(os.path.join(directory, ".git")).st_ino
+    except OSError:
+        return None
+
+
+def _repo_root_unchanged(directory, root, inode, search_parent_directories):
+    """Whether the nearest ``.git`` at or above ``directory`` is still the one of ``root``.
+
+    The directories are walked up to the repository, so a repository created in between,
+    or above ``directory`` when it was in none, is noticed.
+    """
+    while True:
+        git_inode = _git_inode(directory)
+        if git_inode is not None:
+            return directory == root and git_inode == inode
+        parent = os.path.dirname(directory)
+        if parent == directory or not search_parent_directories:
+            return root is None
+        directory = parent
+
+
+def _local_repos():
+    repos = getattr(_thread_repos, "repos", None)
+    if repos is None:
+        repos = _thread_repos.repos = {}
+    return repos
+
+
+def get_repo(path, search_parent_directories=True):
+    """The ``git.Repo`` that ``path`` is in, or ``None``.
+
+    The repositories are cached per directory, and their ``git.Repo`` per thread.  A cached
+    entry is only checked with a ``stat`` of ``.git`` in each directory up to the
+    repository, so repeated file operations in the same tree do not open the repository
+    again.
+    """
+    with io_stats.timed("get_repo"):
+        return _get_repo(path, search_parent_directories)
+
 
+def _get_repo(path, search_parent_directories):
+    if git is None:
+        return None
+    path = os.path.abspath(path)
+    directory = path if os.path.isdir(path) else os.path.dirname(path)
+    key = (directory, search_parent_directories)
+    repos = _local_repos()
+
+    with _repo_cache_lock:
+        cached = _repo_roots.get(key)
+        if cached is not None and _repo_root_unchanged(
+            directory, *cached, search_parent_directories
+        ):
+            _repo_roots.move_to_end(key)
+        else:
+            cached = None
+    if cached is not None:
+        root, inode = cached
+        if root is None:
+            io_stats.add("get_repo.cache_hits")
+            return None
+        cached_repo = repos.get(root)
+        if cached_repo is not None and cached_repo[1] == inode:
+            io_stats.add("get_repo.cache_hits")
+            return cached_repo[0]
+
+    try:
         repo = git.Repo(
             path, search_parent_directories=search_parent_directories
         )
-    except ImportError:
-        pass
     except git.InvalidGitRepositoryError:
-        pass
+        repo = None
 
+    root = repo.working_tree_dir if repo is not None else None
+    if repo is not None and root is None:
+        # bare repositories have no files to track, do not cache them
+        return repo
+    inode = _git_inode(root) if root is not None else None
+    if root is not None:
+        cached_repo = repos.get(root)
+        if cached_repo is not None and cached_repo[1] == inode:
+            # the same repository, found from another directory
+            repo = cached_repo[0]
+        else:
+            repos[root] = (repo, inode)
+    with _repo_cache_lock:
+        _repo_roots[key] = (root, inode)
+        _repo_roots.move_to_end(key)
+        while len(_repo_roots) > _repo_cache_size:
+            _repo_roots.popitem(last=False)
+        roots = set(root for root, _ in _repo_roots.values())
+    for cached_root in [r for r in repos if r not in roots]:
+        del repos[cached_root]
     return repo
 
 
-def set_exe_file(filename, set_exe=True):
-    IXALL = stat.S_IXOTH | stat.S_IXGRP | stat.S_IXUSR
+class IndexSession(object):
+    """Collect the changes to the git index of a repository and write them at once.
+
+    Without a session every file operation below updates, and so rewrites, the git index on
+    its own.  See ``index_session``.
+    """
+
+    def __init__(self, repo):
+        self.repo = repo
+        # path -> "add" or "remove", the last operation on the path wins
+        self._ops = OrderedDict()
+        # path -> whether the file is executable
+        self._exe = OrderedDict()
+
+    def add(self, filename):
+        self._ops[os.path.abspath(filename)] = "add"
+
+    def remove(self, filename):
+        path = os.path.abspath(filename)
+        self._ops[path] = "remove"
+        self._exe.pop(path, None)
+
+    def set_exe(self, filename, set_exe):
+        self._exe[os.path.abspath(filename)] = set_exe
+
+    def _rela_path(self, path):
+        return os.path.relpath(path, self.repo.working_tree_dir).replace(os.sep, "/")
+
+    def flush(self):
+        if self.repo is None or not (self._ops or self._exe):
+            return
+        from git.index.typ import IndexEntry
+
+        index = self.repo.index
+        removed = set(
+            self._rela_path(path) for path, op in self._ops.items() if op == "remove"
+        )
+        if removed:
+            # removed directories take everything below them along
+            prefixes = tuple(r + "/" for r in removed)
+            for path, stage in list(index.entries):
+                if path in removed or path.startswith(prefixes):
+                    del index.entries[(path, stage)]
+        added = [path for path, op in self._ops.items() if op == "add"]
+        if added:
+            index.add(added, write=False)
+        for path, set_exe in self._exe.items():
+            key = (self._rela_path(path), 0)
+            entry = index.entries.get(key)
+            if entry is None:
+                continue
+            mode = 0o100755 if set_exe else 0o100644
+            index.entries[key] = IndexEntry((mode,) + tuple(entry[1:]))
+        # the cached trees of the index no longer match its entries
+        index.write(ignore_extension_data=True)
+        io_stats.add("git.index_writes")
+        self._ops.clear()
+        self._exe.clear()
+
+
+_local = threading.local()
+
+
+def _active_session():
+    return getattr(_local, "session", None)
+
+
+@contextmanager
+def index_session(path):
+    """Batch the git index updates of the file operations in the block.
+
+    The repository of ``path`` is looked up once, and the files added, removed and made
+    executable in the block are staged with a single write of the git index when the block
+    is left.  Sessions are per thread, nested sessions join the outer one.
+    """
+    if _active_session() is not None:
+        yield _active_session()
+        return
+    session = IndexSession(get_repo(path))
+    _local.session = session
+    try:
+        yield session
+    finally:
+        _local.session = None
+        session.flush()
 
+
+def _index_add(filename):
+    session = _active_session()
+    if session is not None:
+        session.add(filename)
+        return
     repo = get_repo(filename)
     if repo:
-        mode = "+x" if set_exe else "-x"
-        repo.git.execute(
-            ["git", "update-index", "--chmod=%s" % mode, filename]
-        )
+        repo.index.add([filename])
+        io_stats.add("git.index_writes")
+
+
+def _index_remove(filename, r=False):
+    session = _active_session()
+    if session is not None:
+        session.remove(filename)
+        return
+    repo = get_repo(filename)
+    if repo:
+        if r:
+            repo.index.remove([filename], r=True)
+        else:
+            repo.index.remove([filename])
+        # git rm
+        io_stats.add("git.index_writes")
+        io_stats.add("git.subprocesses")
+
+
+def set_exe_file(filename, set_exe=True):
+    with io_stats.timed("set_exe_file"):
+        _set_exe_file(filename, set_exe)
+
+
+def _set_exe_file(filename, set_exe):
+    IXALL = stat.S_IXOTH | stat.S_IXGRP | stat.S_IXUSR
+
+    session = _active_session()
+    if session is not None:
+        session.set_exe(filename, set_exe)
+    else:
+        repo = get_repo(filename)
+        if repo:
+            mode = "+x" if set_exe else "-x"
+            repo.git.execute(
+                ["git", "update-index", "--chmod=%s" % mode, filename]
+            )
+            io_stats.add("git.index_writes")
+            io_stats.add("git.subprocesses")
 
     mode = os.stat(filename).st_mode
     if set_exe:
@@ -45,12 +349,18 @@ def write_file(filename):
     if dirname and not os.path.exists(dirname):
         os.makedirs(dirname)
 
-    with io.open(filename, "w", encoding="utf-8", newline="\n") as fh:
+    fh = io.open(filename, "w", encoding="utf-8", newline="\n")
+    try:
         yield fh
+    except BaseException:
+        fh.close()
+        raise
+    # only the final flush and the staging are timed, not the rendering of the content
+    with io_stats.timed("write_file"):
+        fh.close()
+        io_stats.add("write_file.bytes", os.path.getsize(filename))
 
-    repo = get_repo(filename)
-    if repo:
-        repo.index.add([filename])
+        _index_add(filename)
 
 
 def touch_file(filename):
@@ -62,61 +372,190 @@ def remove_file_or_dir(filename):
     if not os.path.isdir(filename):
         return remove_file(filename)
 
-    repo = get_repo(filename)
-    if repo:
-        repo.index.remove([filename], r=True)
-    shutil.rmtree(filename)
+    with io_stats.timed("remove_file"):
+        _index_remove(filename, r=True)
+        shutil.rmtree(filename)
 
 
 def remove_file(filename):
-    touch_file(filename)
+    with io_stats.timed("remove_file"):
+        touch_file(filename)
 
-    repo = get_repo(filename)
-    if repo:
-        repo.index.remove([filename])
+        _index_remove(filename)
 
-    os.remove(filename)
+        os.remove(filename)
 
-    dirname = os.path.dirname(filename)
-    if dirname and not os.listdir(dirname):
-        os.removedirs(dirname)
+        dirname = os.path.dirname(filename)
+        if dirname and not os.listdir(dirname):
+            os.removedirs(dirname)
 
 
-def copy_file(src, dst):
-    """
-    Try to copy utf-8 text files line-by-line to avoid getting CRLF characters added on Windows.
+# bytes read at a time by copy_file
+COPY_CHUNK_SIZE = 1024 * 1024
+# ioctl to clone a file on copy-on-write filesystems, from linux/fs.h
+_FICLONE = 0x40049409
+
 
-    If the file fails to be decoded with utf-8, we revert to a regular copy.
+def _needs_newline_conversion(fh):
+    """Whether the binary file ``fh`` is utf-8 text with carriage returns.
+
+    Stops reading at the first carriage return or invalid utf-8 byte.
     """
+    decoder = codecs.getincrementaldecoder("utf-8")()
     try:
-        with io.open(src, "r", encoding="utf-8") as fh_src:
-            with io.open(dst, "w", encoding="utf-8", newline="\n") as fh_dst:
-                for line in fh_src:
-                    fh_dst.write(line)
+        for chunk in iter(lambda: fh.read(COPY_CHUNK_SIZE), b""):
+            decoder.decode(chunk)
+            if b"\r" in chunk:
+                return True
+        decoder.decode(b"", final=True)
     except UnicodeDecodeError:
-        # Leave any other files alone.
-        shutil.copy(src, dst)
+        pass
+    return False
+
+
+def _reflink(fh_src, fh_dst):
+    """Make ``fh_dst`` a copy-on-write clone of ``fh_src``, if the filesystem supports it."""
+    if fcntl is None or not sys.platform.startswith("linux"):
+        return False
+    try:
+        fcntl.ioctl(fh_dst.fileno(), _FICLONE, fh_src.fileno())
+    except OSError:
+        # e.g. not a btrfs or xfs filesystem, or across filesystems
+        return False
+    return True
+
+
+def _copy_bytes(src, dst):
+    """Copy ``src`` to ``dst`` as is, within the kernel where the platform allows it."""
+    copy_file_range = getattr(os, "copy_file_range", None)
+    with io.open(src, "rb") as fh_src, io.open(dst, "wb") as fh_dst:
+        if _reflink(fh_src, fh_dst):
+            return
+        if copy_file_range is not None:
+            try:
+                src_fd, dst_fd = fh_src.fileno(), fh_dst.fileno()
+                while copy_file_range(src_fd, dst_fd, COPY_CHUNK_SIZE * 64):
+                    pass
+                return
+            except OSError:
+                # e.g. not supported across these filesystems
+                pass
+    # uses sendfile or fcopyfile where available
+    shutil.copyfile(src, dst)
+
+
+def _same_file(src, dst):
+    """Whether ``dst`` already has the content and permissions of ``src``.
+
+    Text files with carriage returns are never the same, their copy has other line endings.
+    """
+    try:
+        src_stat, dst_stat = os.stat(src), os.stat(dst)
+    except OSError:
+        return False
+    if stat.S_IMODE(src_stat.st_mode) != stat.S_IMODE(dst_stat.st_mode):
+        return False
+    if not filecmp.cmp(src, dst, shallow=False):
+        return False
+    with io.open(src, "rb") as fh_src:
+        return not _needs_newline_conversion(fh_src)
+
+
+def _copy_normalizing_newlines(src, dst):
+    """Copy the utf-8 text file ``src`` to ``dst`` with CRLF and CR line endings as LF.
+
+    Raises ``UnicodeDecodeError`` if ``src`` turns out not to be utf-8.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending_cr = False
+    with io.open(src, "rb") as fh_src, io.open(dst, "wb") as fh_dst:
+        for chunk in iter(lambda: fh_src.read(COPY_CHUNK_SIZE), b""):
+            decoder.decode(chunk)
+            # a carriage return is never part of a multi-byte utf-8 sequence
+            if pending_cr:
+                chunk = b"\r" + chunk
+            # it may be followed by a line feed in the next chunk
+            pending_cr = chunk.endswith(b"\r")
+            if pending_cr:
+                chunk = chunk[:-1]
+            fh_dst.write(chunk.replace(b"\r\n", b"\n").replace(b"\r", b"\n"))
+        decoder.decode(b"", final=True)
+        if pending_cr:
+            fh_dst.write(b"\n")
+
+
+def copy_file(src, dst, skip_identical=False):
+    """
+    Copy utf-8 text files with LF line endings, to avoid getting CRLF characters added on
+    Windows.
+
+    Files are read in chunks of bytes.  Unless a file is utf-8 text with carriage returns, it
+    is copied as is: as a copy-on-write reflink where the filesystem supports it, otherwise
+    within the kernel where possible.  With ``skip_identical``, a ``dst`` that already has
+    the content and permissions of ``src``, and needs no newline conversion, is left alone.
+    """
+    with io_stats.timed("copy_file"):
+        if skip_identical and _same_file(src, dst):
+            io_stats.add("copy_file.skipped")
+        else:
+            _copy_file_contents(src, dst)
+
+        _index_add(dst)
+
+
+def _copy_file_contents(src, dst):
+    with io.open(src, "rb") as fh_src:
+        convert = _needs_newline_conversion(fh_src)
+    if convert:
+        try:
+            _copy_normalizing_newlines(src, dst)
+        except UnicodeDecodeError:
+            # Leave any other files alone.
+            convert = False
+    if not convert:
+        _copy_bytes(src, dst)
 
     shutil.copymode(src, dst)
+    io_stats.add("copy_file.bytes", os.path.getsize(dst))
 
-    repo = get_repo(dst)
-    if repo:
-        repo.index.add([dst])
+
+def _copy_file_contents_timed(paths):
+    with io_stats.timed("copy_file"):
+        _copy_file_contents(*paths)
 
 
-def copytree(src, dst, ignore=(), root_dst=None):
+def copytree(src, dst, ignore=(), root_dst=None, max_workers=None):
     """This emulates shutil.copytree, but does so with our git file tracking, so that the new files
-    are added to the repo"""
+    are added to the repo
+
+    The files are copied on a pool of ``max_workers`` threads, and all of them are staged
+    with a single update of the git index once they are copied.  ``ignore`` holds paths
+    relative to ``root_dst``, which defaults to ``dst``.
+    """
     if root_dst is None:
         root_dst = dst
-    for item in os.listdir(src):
-        s = os.path.join(src, item)
-        d = os.path.join(dst, item)
-        if os.path.relpath(d, root_dst) in ignore:
-            continue
-        elif os.path.isdir(s):
-            if not os.path.exists(d):
-                os.makedirs(d)
-            copytree(s, d, ignore, root_dst=root_dst)
-        else:
-            copy_file(s, d)
+    copies = []
+    directories = [(src, dst)]
+    while directories:
+        src_dir, dst_dir = directories.pop()
+        with os.scandir(src_dir) as entries:
+            for entry in entries:
+                d = os.path.join(dst_dir, entry.name)
+                if os.path.relpath(d, root_dst) in ignore:
+                    continue
+                elif entry.is_dir():
+                    if not os.path.exists(d):
+                        os.makedirs(d)
+                    directories.append((entry.path, d))
+                else:
+                    copies.append((entry.path, d))
+
+    if max_workers is None:
+        max_workers = min(8, (os.cpu_count() or 1) + 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # raises the error of the first copy that failed, if any
+        list(executor.map(_copy_file_contents_timed, copies))
+
+    with index_session(dst):
+        for _, d in copies:
+            _index_add(d)
@@ -0,0 +1,138 @@
+"""Check that GitHub logins exist, for the recipe maintainers checked by the linter.
+
+All the logins that are not known yet are resolved with a single GraphQL query (per
+``BATCH_SIZE`` logins), and the answers, whether the login exists or not, are kept for
+a day in ``~/.nwb-extensions-smithy/github_users.json``.  Linting a batch of recipes
+then asks GitHub about each maintainer at most once.
+
+When the GraphQL API cannot be used the logins are looked up one by one with the REST
+API, ``MAX_WORKERS`` at a time.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import logging
+import os
+
+import github
+
+from .utils import JSONFileCache
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE = os.path.expanduser("~/.nwb-extensions-smithy/github_users.json")
+CACHE_TTL = 24 * 60 * 60
+# logins resolved by a single GraphQL query
+BATCH_SIZE = 100
+# concurrent REST lookups when GraphQL cannot be used
+MAX_WORKERS = 8
+TIMEOUT = 30
+
+GRAPHQL_URL = "https://api.github.com/graphql"
+
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = JSONFileCache(CACHE_FILE, CACHE_TTL)
+    return _default_cache
+
+
+@functools.lru_cache(maxsize=None)
+def github_client(token):
+    """A ``github.Github`` client for ``token``, shared by all the callers."""
+    return github.Github(token)
+
+
+def _graphql_query(logins):
+    variables = {"l{}".format(i): login for i, login in enumerate(logins)}
+    query = "query({}) {{\n{}\n}}".format(
+        ", ".join("${}: String!".format(name) for name in variables),
+        "\n".join(
+            "  u{0}: repositoryOwner(login: $l{0}) {{ login }}".format(i)
+            for i in range(len(logins))
+        ),
+    )
+    return query, variables
+
+
+def query_graphql(logins, token, timeout=TIMEOUT):
+    """Resolve ``logins`` with a single GraphQL query.
+
+    Returns a dict telling whether each login exists; the logins GitHub gave no
+    definite answer for are left out.
+    """
+    import requests
+
+    query, variables = _graphql_query(logins)
+    resp = requests.post(
+        GRAPHQL_URL,
+        json={"query": query, "variables": variables},
+        headers={"Authorization": "bearer {}".format(token)},
+        timeout=timeout,
+    )
+    resp.raise_for_status()
+    result = resp.json()
+    data = result.get("data") or {}
+    error_types = {
+        error["path"][0]: error.get("type")
+        for error in result.get("errors") or []
+        if error.get("path")
+    }
+    exists = {}
+    for i, login in enumerate(logins):
+        alias = "u{}".format(i)
+        if data.get(alias):
+            exists[login] = True
+        elif alias in data and error_types.get(alias, "NOT_FOUND") == "NOT_FOUND":
+            # an unknown login is a null owner, along with a NOT_FOUND error or not
+            exists[login] = False
+    return exists
+
+
+def _user_exists(gh, login):
+    try:
+        gh.get_user(login)
+    except github.UnknownObjectException:
+        return False
+    return True
+
+
+def query_rest(logins, token, max_workers=MAX_WORKERS):
+    """Look up ``logins`` one by one with the REST API, ``max_workers`` at a time."""
+    gh = github_client(token)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        found = executor.map(functools.partial(_user_exists, gh), logins)
+        return dict(zip(logins, found))
+
+
+def check_logins(logins, token, cache=None):
+    """Tell whether each of the GitHub ``logins`` exists, as a dict.
+
+    Teams, i.e. ``org/team``, are not checked and are not part of the result.
+    """
+    import requests
+
+    cache = default_cache() if cache is None else cache
+    unique = sorted({login for login in logins if "/" not in login})
+    exists = {login: cache.get(login) for login in unique}
+    missing = [login for login, found in exists.items() if found is None]
+
+    resolved = {}
+    for start in range(0, len(missing), BATCH_SIZE):
+        batch = missing[start : start + BATCH_SIZE]
+        try:
+            resolved.update(query_graphql(batch, token))
+        except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+            logger.info("Cannot query the GitHub GraphQL API: %s", e)
+            break
+    unresolved = [login for login in missing if login not in resolved]
+    if unresolved:
+        resolved.update(query_rest(unresolved, token))
+
+    if resolved:
+        cache.update(resolved)
+    exists.update(resolved)
+    return exists
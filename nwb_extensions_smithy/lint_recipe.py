@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+from collections import Counter, OrderedDict, namedtuple
 from collections.abc import Sequence, Mapping
 
 import copy
@@ -7,12 +8,14 @@ import io
 import itertools
 import os
 import re
+import time
 
 import github
 
 from conda_build.metadata import ensure_valid_license_family
 import conda_build.conda_interface
 
+from . import github_users
 from .metadata import MetaData, FIELDS as ndxfields
 
 str_type = str
@@ -43,6 +46,10 @@ TEST_FILES = ["run_test.py", "run_test.sh", "run_test.bat", "run_test.pl"]
 
 sel_pat = re.compile(r"(.+?)\s*(#.*)?\[([^\[\]]+)\](?(2).*)$")
 jinja_pat = re.compile(r"\s*\{%\s*(set)\s+[^\s]+\s*=\s*[^\s]+\s*%\}")
+# Good selectors look like ".*\s\s#\s[...]"
+good_selectors_pat = re.compile(r"(.+?)\s{2,}#\s\[(.+)\](?(2).*)$")
+# Good Jinja2 variable definitions look like "{% set .+ = .+ %}"
+good_jinja_pat = re.compile(r"\s*\{%\s(set)\s[^\s]+\s=\s[^\s]+\s%\}")
 
 
 def get_section(parent, name, lints):
@@ -104,116 +111,295 @@ def lint_about_contents(about_section, lints):
             )
 
 
-def lintify(meta, recipe_dir=None, conda_forge=False):
+class LintRule(object):
+    """A check of the linter, registered in ``RULES`` under its id.
+
+    The lints are ``L<n>`` and the hints ``H<n>``.  The function of a rule is called
+    with the ``LintedRecipe`` and the lists of lints and hints to append to.
+    """
+
+    def __init__(self, id, func):
+        self.id = id
+        self.func = func
+        self.description = (func.__doc__ or "").strip()
+
+    @property
+    def kind(self):
+        return "hint" if self.id.startswith("H") else "lint"
+
+    def __call__(self, recipe, lints, hints):
+        self.func(recipe, lints, hints)
+
+    def __repr__(self):
+        return "LintRule({!r})".format(self.id)
+
+
+#: All the rules of the linter, in the order they run.
+RULES = OrderedDict()
+
+
+def rule(id):
+    """Register the decorated function as the lint rule ``id``."""
+
+    def register(func):
+        if id in RULES:
+            raise ValueError("The lint rule {} is already registered.".format(id))
+        RULES[id] = LintRule(id, func)
+        return func
+
+    return register
+
+
+def select_rules(select=None, ignore=None):
+    """The rules to run, in the order they are registered.
+
+    ``select`` and ``ignore`` are rule ids, ``L`` and ``H`` standing for all the lints
+    and all the hints.  Without ``select`` every rule is selected.
+    """
+
+    def expand(ids):
+        rule_ids = set()
+        for id in ids:
+            if id in ("L", "H"):
+                rule_ids.update(r.id for r in RULES.values() if r.id.startswith(id))
+            elif id in RULES:
+                rule_ids.add(id)
+            else:
+                raise ValueError(
+                    "Unknown lint rule {}, expected one of {}.".format(
+                        id, ", ".join(RULES)
+                    )
+                )
+        return rule_ids
+
+    selected = expand(select) if select is not None else set(RULES)
+    ignored = expand(ignore or ())
+    return [r for r in RULES.values() if r.id in selected and r.id not in ignored]
+
+
+class RuleProfile(object):
+    """The cumulative time spent in each rule, across all the recipes linted with it."""
+
+    def __init__(self):
+        self.recipes = 0
+        self.calls = Counter()
+        self.seconds = Counter()
+
+    def add(self, rule_id, seconds):
+        self.calls[rule_id] += 1
+        self.seconds[rule_id] += seconds
+
+    def update(self, other):
+        """Add the times of another profile, e.g. of a worker process."""
+        self.recipes += other.recipes
+        self.calls.update(other.calls)
+        self.seconds.update(other.seconds)
+
+    def report(self):
+        total = sum(self.seconds.values())
+        lines = [
+            "Time spent in the lint rules of {} recipe(s)".format(self.recipes),
+            "{:<6} {:>8} {:>10} {:>7}  {}".format(
+                "rule", "calls", "seconds", "share", "description"
+            ),
+        ]
+        for rule_id, seconds in self.seconds.most_common():
+            lines.append(
+                "{:<6} {:>8} {:>10.3f} {:>6.1f}%  {}".format(
+                    rule_id,
+                    self.calls[rule_id],
+                    seconds,
+                    100.0 * seconds / total if total else 0.0,
+                    RULES[rule_id].description if rule_id in RULES else "",
+                )
+            )
+        lines.append("{:<6} {:>8} {:>10.3f}".format("total", "", total))
+        return "\n".join(lines)
+
+
+class LintedRecipe(object):
+    """The recipe as seen by the lint rules.
+
+    The sections of ``meta`` are looked up once; a section of the wrong type is replaced
+    by an empty one, and its lint kept in ``section_lints`` for rule L0a.
+    ``recipe_lines`` are the lines of ``ndx-meta.yaml``, or ``None`` if there is no such
+    file.
+    """
+
+    def __init__(self, meta, recipe_dir=None, conda_forge=False):
+        self.section_lints = lints = []
+        self.meta = meta
+        self.recipe_dir = recipe_dir
+        self.conda_forge = conda_forge
+
+        # If the recipe_dir exists (no guarantee within this function) , we can
+        # find the meta.yaml within it.
+        self.meta_fname = os.path.join(recipe_dir or "", "ndx-meta.yaml")
+
+        self.sources_section = get_section(meta, "source", lints)
+        self.build_section = get_section(meta, "build", lints)
+        self.requirements_section = get_section(meta, "requirements", lints)
+        self.test_section = get_section(meta, "test", lints)
+        self.about_section = get_section(meta, "about", lints)
+        self.extra_section = get_section(meta, "extra", lints)
+        self.package_section = get_section(meta, "package", lints)
+        self.outputs_section = get_section(meta, "outputs", lints)
+        self.build_reqs = self.requirements_section.get("build", None)
+
+        recipe_dirname = os.path.basename(recipe_dir) if recipe_dir else "recipe"
+        self.is_staged_recipes = recipe_dirname != "recipe"
+
+        self.unexpected_sections = [
+            section for section in meta if section not in EXPECTED_SECTION_ORDER
+        ]
+        self.major_sections = [
+            section for section in meta if section in EXPECTED_SECTION_ORDER
+        ]
+
+        # The lines of meta.yaml, read once for all the line based lints.
+        if os.path.exists(self.meta_fname):
+            self.recipe_lines = read_recipe_lines(self.meta_fname)
+        else:
+            self.recipe_lines = None
+        self.has_recipe_file = recipe_dir is not None and self.recipe_lines is not None
+
+
+def lintify(
+    meta, recipe_dir=None, conda_forge=False, select=None, ignore=None, profile=None
+):
+    """Lint the recipe, returning its lints and hints.
+
+    ``select`` and ``ignore`` choose the rules to run, see ``select_rules``.  The time
+    spent in every rule is added to ``profile``, a ``RuleProfile``, if given.
+    """
     lints = []
     hints = []
-    major_sections = list(meta.keys())
+    recipe = LintedRecipe(meta, recipe_dir, conda_forge)
+    for lint_rule in select_rules(select, ignore):
+        if profile is None:
+            lint_rule(recipe, lints, hints)
+            continue
+        start = time.perf_counter()
+        try:
+            lint_rule(recipe, lints, hints)
+        finally:
+            profile.add(lint_rule.id, time.perf_counter() - start)
+    if profile is not None:
+        profile.recipes += 1
+    return lints, hints
 
-    # If the recipe_dir exists (no guarantee within this function) , we can
-    # find the meta.yaml within it.
-    meta_fname = os.path.join(recipe_dir or "", "ndx-meta.yaml")
 
-    sources_section = get_section(meta, "source", lints)
-    build_section = get_section(meta, "build", lints)
-    requirements_section = get_section(meta, "requirements", lints)
-    test_section = get_section(meta, "test", lints)
-    about_section = get_section(meta, "about", lints)
-    extra_section = get_section(meta, "extra", lints)
-    package_section = get_section(meta, "package", lints)
-    outputs_section = get_section(meta, "outputs", lints)
+@rule("L0a")
+def _lint_section_types(recipe, lints, hints):
+    """Sections should have the expected type, a dictionary or a list."""
+    lints.extend(recipe.section_lints)
 
-    recipe_dirname = os.path.basename(recipe_dir) if recipe_dir else "recipe"
-    is_staged_recipes = recipe_dirname != "recipe"
 
-    # 0: Top level keys should be expected
-    unexpected_sections = []
-    for section in major_sections:
-        if section not in EXPECTED_SECTION_ORDER:
-            lints.append(
-                "The top level meta key {} is unexpected".format(section)
-            )
-            unexpected_sections.append(section)
+@rule("L0")
+def _lint_unexpected_sections(recipe, lints, hints):
+    """Top level keys should be expected."""
+    for section in recipe.unexpected_sections:
+        lints.append("The top level meta key {} is unexpected".format(section))
+
+
+@rule("L1")
+def _lint_section_order(recipe, lints, hints):
+    """Top level meta.yaml keys should have a specific order."""
+    lint_section_order(list(recipe.major_sections), lints)
 
-    for section in unexpected_sections:
-        major_sections.remove(section)
 
-    # 1: Top level meta.yaml keys should have a specific order.
-    lint_section_order(major_sections, lints)
+@rule("L2")
+def _lint_about_contents(recipe, lints, hints):
+    """The about section should have a home, license and summary."""
+    lint_about_contents(recipe.about_section, lints)
 
-    # 2: The about section should have a home, license and summary.
-    lint_about_contents(about_section, lints)
 
-    # 3a: The recipe should have some maintainers.
-    if not extra_section.get("recipe-maintainers", []):
+@rule("L3a")
+def _lint_has_maintainers(recipe, lints, hints):
+    """The recipe should have some maintainers."""
+    if not recipe.extra_section.get("recipe-maintainers", []):
         lints.append(
             "The recipe could do with some maintainers listed in "
             "the `extra/recipe-maintainers` section."
         )
 
-    # 3b: Maintainers should be a list
-    if not (
-        isinstance(extra_section.get("recipe-maintainers", []), Sequence)
-        and not isinstance(
-            extra_section.get("recipe-maintainers", []), str
-        )
-    ):
+
+@rule("L3b")
+def _lint_maintainers_list(recipe, lints, hints):
+    """Maintainers should be a list."""
+    maintainers = recipe.extra_section.get("recipe-maintainers", [])
+    if not (isinstance(maintainers, Sequence) and not isinstance(maintainers, str)):
         lints.append("Recipe maintainers should be a json list.")
 
-    # 4: The recipe should have some tests.
-    if not any(key in TEST_KEYS for key in test_section):
-        a_test_file_exists = recipe_dir is not None and any(
-            os.path.exists(os.path.join(recipe_dir, test_file))
-            for test_file in TEST_FILES
-        )
-        if not a_test_file_exists:
-            has_outputs_test = False
-            no_test_hints = []
-            if outputs_section:
-                for out in outputs_section:
-                    test_out = get_section(out, "test", lints)
-                    if any(key in TEST_KEYS for key in test_out):
-                        has_outputs_test = True
-                    else:
-                        no_test_hints.append(
-                            "It looks like the '{}' output doesn't "
-                            "have any tests.".format(out.get("name", "???"))
-                        )
 
-            if has_outputs_test:
-                hints.extend(no_test_hints)
+@rule("L4")
+def _lint_has_tests(recipe, lints, hints):
+    """The recipe should have some tests."""
+    if any(key in TEST_KEYS for key in recipe.test_section):
+        return
+    a_test_file_exists = recipe.recipe_dir is not None and any(
+        os.path.exists(os.path.join(recipe.recipe_dir, test_file))
+        for test_file in TEST_FILES
+    )
+    if a_test_file_exists:
+        return
+    has_outputs_test = False
+    no_test_hints = []
+    if recipe.outputs_section:
+        for out in recipe.outputs_section:
+            test_out = get_section(out, "test", lints)
+            if any(key in TEST_KEYS for key in test_out):
+                has_outputs_test = True
             else:
-                lints.append("The recipe must have some tests.")
+                no_test_hints.append(
+                    "It looks like the '{}' output doesn't "
+                    "have any tests.".format(out.get("name", "???"))
+                )
+
+    if has_outputs_test:
+        hints.extend(no_test_hints)
+    else:
+        lints.append("The recipe must have some tests.")
+
 
-    # 5: License cannot be 'unknown.'
-    license = about_section.get("license", "").lower()
+@rule("L5")
+def _lint_license_unknown(recipe, lints, hints):
+    """License cannot be 'unknown.'"""
+    license = recipe.about_section.get("license", "").lower()
     if "unknown" == license.strip():
         lints.append("The recipe license cannot be unknown.")
 
-    # 6: Selectors should be in a tidy form.
-    if recipe_dir is not None and os.path.exists(meta_fname):
-        bad_selectors = []
-        bad_lines = []
-        # Good selectors look like ".*\s\s#\s[...]"
-        good_selectors_pat = re.compile(r"(.+?)\s{2,}#\s\[(.+)\](?(2).*)$")
-        with io.open(meta_fname, "rt") as fh:
-            for selector_line, line_number in selector_lines(fh):
-                if not good_selectors_pat.match(selector_line):
-                    bad_selectors.append(selector_line)
-                    bad_lines.append(line_number)
-        if bad_selectors:
-            lints.append(
-                "Selectors are suggested to take a "
-                "``<two spaces>#<one space>[<expression>]`` form."
-                " See lines {}".format(bad_lines)
-            )
 
-    # 7: The build section should have a build number.
-    if build_section.get("number", None) is None:
+@rule("L6")
+def _lint_selectors_form(recipe, lints, hints):
+    """Selectors should be in a tidy form."""
+    if not recipe.has_recipe_file:
+        return
+    bad_lines = [
+        line.number
+        for line in recipe.recipe_lines
+        if line.selector and not good_selectors_pat.match(line.text)
+    ]
+    if bad_lines:
+        lints.append(
+            "Selectors are suggested to take a "
+            "``<two spaces>#<one space>[<expression>]`` form."
+            " See lines {}".format(bad_lines)
+        )
+
+
+@rule("L7")
+def _lint_build_number(recipe, lints, hints):
+    """The build section should have a build number."""
+    if recipe.build_section.get("number", None) is None:
         lints.append("The recipe must have a `build/number` section.")
 
-    # 8: The build section should be before the run section in requirements.
+
+@rule("L8")
+def _lint_requirements_order(recipe, lints, hints):
+    """The build section should be before the run section in requirements."""
     seen_requirements = [
-        k for k in requirements_section if k in REQUIREMENTS_ORDER
+        k for k in recipe.requirements_section if k in REQUIREMENTS_ORDER
     ]
     requirements_order_sorted = sorted(
         seen_requirements, key=REQUIREMENTS_ORDER.index
@@ -228,8 +414,11 @@ def lintify(meta, recipe_dir=None, conda_forge=False):
             + "."
         )
 
-    # 9: Files downloaded should have a hash.
-    for source_section in sources_section:
+
+@rule("L9")
+def _lint_source_hash(recipe, lints, hints):
+    """Files downloaded should have a hash."""
+    for source_section in recipe.sources_section:
         if "url" in source_section and not (
             {"sha1", "sha256", "md5"} & set(source_section.keys())
         ):
@@ -238,59 +427,82 @@ def lintify(meta, recipe_dir=None, conda_forge=False):
                 "or md5 checksum (sha256 preferably)."
             )
 
-    # 10: License should not include the word 'license'.
-    license = about_section.get("license", "").lower()
+
+@rule("L10")
+def _lint_license_word(recipe, lints, hints):
+    """License should not include the word 'license'."""
+    license = recipe.about_section.get("license", "").lower()
     if "license" in license.lower() and "unlicense" not in license.lower():
         lints.append(
             "The recipe `license` should not include the word " '"License".'
         )
 
-    # 11: There should be one empty line at the end of the file.
-    if recipe_dir is not None and os.path.exists(meta_fname):
-        with io.open(meta_fname, "r") as f:
-            lines = f.read().split("\n")
-        # Count the number of empty lines from the end of the file
-        empty_lines = itertools.takewhile(lambda x: x == "", reversed(lines))
-        end_empty_lines_count = len(list(empty_lines))
-        if end_empty_lines_count > 1:
-            lints.append(
-                "There are {} too many lines.  "
-                "There should be one empty line at the end of the "
-                "file.".format(end_empty_lines_count - 1)
-            )
-        elif end_empty_lines_count < 1:
-            lints.append(
-                "There are too few lines.  There should be one empty "
-                "line at the end of the file."
-            )
 
-    # 12: License family must be valid (conda-build checks for that)
+@rule("L11")
+def _lint_end_empty_line(recipe, lints, hints):
+    """There should be one empty line at the end of the file."""
+    if not recipe.has_recipe_file:
+        return
+    # Count the number of empty lines from the end of the file
+    empty_lines = itertools.takewhile(
+        lambda line: line.text == "", reversed(recipe.recipe_lines)
+    )
+    end_empty_lines_count = len(list(empty_lines))
+    if end_empty_lines_count > 1:
+        lints.append(
+            "There are {} too many lines.  "
+            "There should be one empty line at the end of the "
+            "file.".format(end_empty_lines_count - 1)
+        )
+    elif end_empty_lines_count < 1:
+        lints.append(
+            "There are too few lines.  There should be one empty "
+            "line at the end of the file."
+        )
+
+
+@rule("L12")
+def _lint_license_family_valid(recipe, lints, hints):
+    """License family must be valid (conda-build checks for that)."""
     try:
-        ensure_valid_license_family(meta)
+        ensure_valid_license_family(recipe.meta)
     except RuntimeError as e:
         lints.append(str(e))
 
-    # 12a: License family must be valid (conda-build checks for that)
-    license_family = about_section.get("license_family", license).lower()
-    license_file = about_section.get("license_file", "")
+
+@rule("L12a")
+def _lint_license_file(recipe, lints, hints):
+    """The license file is required for some license families."""
+    license = recipe.about_section.get("license", "").lower()
+    license_family = recipe.about_section.get("license_family", license).lower()
+    license_file = recipe.about_section.get("license_file", "")
     needed_families = ["gpl", "bsd", "mit", "apache", "psf"]
     if license_file == "" and any(f for f in needed_families if f in license_family):
         lints.append("license_file entry is missing, but is required.")
 
-    # 13: Check that the recipe name is valid
-    recipe_name = package_section.get("name", "").strip()
+
+@rule("L13")
+def _lint_recipe_name(recipe, lints, hints):
+    """Check that the recipe name is valid."""
+    recipe_name = recipe.package_section.get("name", "").strip()
     if re.match(r"^[a-z0-9_\-.]+$", recipe_name) is None:
         lints.append(
             "Recipe name has invalid characters. only lowercase alpha, numeric, "
             "underscores, hyphens and dots allowed"
         )
 
-    # 14: Run conda-forge specific lints
-    if conda_forge:
-        run_conda_forge_specific(meta, recipe_dir, lints, hints)
 
-    # 15: Check if we are using legacy patterns
-    build_reqs = requirements_section.get("build", None)
+@rule("L14")
+def _lint_conda_forge_specific(recipe, lints, hints):
+    """Run conda-forge specific lints."""
+    if recipe.conda_forge:
+        run_conda_forge_specific(recipe.meta, recipe.recipe_dir, lints, hints)
+
+
+@rule("L15")
+def _lint_numpy_xx(recipe, lints, hints):
+    """Check if we are using legacy patterns."""
+    build_reqs = recipe.build_reqs
     if build_reqs and ("numpy x.x" in build_reqs):
         lints.append(
             "Using pinned numpy packages is a deprecated pattern.  Consider "
@@ -298,12 +510,15 @@ def lintify(meta, recipe_dir=None, conda_forge=False):
             "[here](https://conda-forge.org/docs/maintainer/knowledge_base.html#linking-numpy)."
         )
 
-    # 16: Subheaders should be in the allowed subheadings
-    for section in major_sections:
+
+@rule("L16")
+def _lint_subheaders(recipe, lints, hints):
+    """Subheaders should be in the allowed subheadings."""
+    for section in recipe.major_sections:
         expected_subsections = FIELDS.get(section, [])
         if not expected_subsections:
             continue
-        for subsection in get_section(meta, section, lints):
+        for subsection in get_section(recipe.meta, section, lints):
             if (
                 section != "source"
                 and section != "outputs"
@@ -323,38 +538,26 @@ def lintify(meta, recipe_dir=None, conda_forge=False):
                             " name.".format(section, source_subsection)
                         )
 
-    # 17: noarch doesn't work with selectors for runtime dependencies
-    if build_section.get("noarch") is not None and os.path.exists(meta_fname):
-        with io.open(meta_fname, "rt") as fh:
-            in_runreqs = False
-            for line in fh:
-                line_s = line.strip()
-                if line_s == "host:" or line_s == "run:":
-                    in_runreqs = True
-                    runreqs_spacing = line[: -len(line.lstrip())]
-                    continue
-                if line_s.startswith("skip:") and is_selector_line(line):
-                    lints.append(
-                        "`noarch` packages can't have selectors. If "
-                        "the selectors are necessary, please remove "
-                        "`noarch: {}`.".format(build_section["noarch"])
-                    )
-                    break
-                if in_runreqs:
-                    if runreqs_spacing == line[: -len(line.lstrip())]:
-                        in_runreqs = False
-                        continue
-                    if is_selector_line(line):
-                        lints.append(
-                            "`noarch` packages can't have selectors. If "
-                            "the selectors are necessary, please remove "
-                            "`noarch: {}`.".format(build_section["noarch"])
-                        )
-                        break
 
-    # 19: check version
-    if package_section.get("version") is not None:
-        ver = str(package_section.get("version"))
+@rule("L17")
+def _lint_noarch_selectors(recipe, lints, hints):
+    """noarch doesn't work with selectors for runtime dependencies."""
+    noarch = recipe.build_section.get("noarch")
+    if noarch is None or recipe.recipe_lines is None:
+        return
+    if any(map(is_arch_specific_line, recipe.recipe_lines)):
+        lints.append(
+            "`noarch` packages can't have selectors. If "
+            "the selectors are necessary, please remove "
+            "`noarch: {}`.".format(noarch)
+        )
+
+
+@rule("L19")
+def _lint_version(recipe, lints, hints):
+    """Check version."""
+    if recipe.package_section.get("version") is not None:
+        ver = str(recipe.package_section.get("version"))
         try:
             conda_build.conda_interface.VersionOrder(ver)
         except Exception:
@@ -362,27 +565,31 @@ def lintify(meta, recipe_dir=None, conda_forge=False):
                 "Package version {} doesn't match conda spec".format(ver)
             )
 
-    # 20: Jinja2 variable definitions should be nice.
-    if recipe_dir is not None and os.path.exists(meta_fname):
-        bad_jinja = []
-        bad_lines = []
-        # Good Jinja2 variable definitions look like "{% set .+ = .+ %}"
-        good_jinja_pat = re.compile(r"\s*\{%\s(set)\s[^\s]+\s=\s[^\s]+\s%\}")
-        with io.open(meta_fname, "rt") as fh:
-            for jinja_line, line_number in jinja_lines(fh):
-                if not good_jinja_pat.match(jinja_line):
-                    bad_jinja.append(jinja_line)
-                    bad_lines.append(line_number)
-        if bad_jinja:
-            lints.append(
-                "Jinja2 variable definitions are suggested to "
-                "take a ``{{%<one space>set<one space>"
-                "<variable name><one space>=<one space>"
-                "<expression><one space>%}}`` form. See lines "
-                "{}".format(bad_lines)
-            )
 
-    # 21: Legacy usage of compilers
+@rule("L20")
+def _lint_jinja_variable_definitions(recipe, lints, hints):
+    """Jinja2 variable definitions should be nice."""
+    if not recipe.has_recipe_file:
+        return
+    bad_lines = [
+        line.number
+        for line in recipe.recipe_lines
+        if line.jinja and not good_jinja_pat.match(line.text)
+    ]
+    if bad_lines:
+        lints.append(
+            "Jinja2 variable definitions are suggested to "
+            "take a ``{{%<one space>set<one space>"
+            "<variable name><one space>=<one space>"
+            "<expression><one space>%}}`` form. See lines "
+            "{}".format(bad_lines)
+        )
+
+
+@rule("L21")
+def _lint_toolchain(recipe, lints, hints):
+    """Legacy usage of compilers."""
+    build_reqs = recipe.build_reqs
     if build_reqs and ("toolchain" in build_reqs):
         lints.append(
             "Using toolchain directly in this manner is deprecated.  Consider "
@@ -390,8 +597,11 @@ def lintify(meta, recipe_dir=None, conda_forge=False):
             "[here](https://conda-forge.org/docs/maintainer/knowledge_base.html#compilers)."
         )
 
-    # 22: Single space in pinned requirements
-    for section, requirements in requirements_section.items():
+
+@rule("L22")
+def _lint_pin_spaces(recipe, lints, hints):
+    """Single space in pinned requirements."""
+    for section, requirements in recipe.requirements_section.items():
         for requirement in requirements:
             req, _, _ = requirement.partition("#")
             if "{{" in req:
@@ -428,10 +638,12 @@ def lintify(meta, recipe_dir=None, conda_forge=False):
                 )))
                 continue
 
-    # hints
-    # 1: suggest pip
-    if "script" in build_section:
-        scripts = build_section["script"]
+
+@rule("H1")
+def _hint_pip(recipe, lints, hints):
+    """Suggest pip."""
+    if "script" in recipe.build_section:
+        scripts = recipe.build_section["script"]
         if isinstance(scripts, str):
             scripts = [scripts]
         for script in scripts:
@@ -441,39 +653,59 @@ def lintify(meta, recipe_dir=None, conda_forge=False):
                     "See https://conda-forge.org/docs/maintainer/adding_pkgs.html#use-pip"
                 )
 
-    # 2: suggest python noarch (skip on feedstocks)
-    if build_section.get("noarch") is None and build_reqs and not any(["_compiler_stub" in b for b in build_reqs]) \
-            and ("pip" in build_reqs) and (is_staged_recipes or not conda_forge):
-        with io.open(meta_fname, "rt") as fh:
-            in_runreqs = False
-            no_arch_possible = True
-            for line in fh:
-                line_s = line.strip()
-                if line_s == "host:" or line_s == "run:":
-                    in_runreqs = True
-                    runreqs_spacing = line[: -len(line.lstrip())]
-                    continue
-                if line_s.startswith("skip:") and is_selector_line(line):
-                    no_arch_possible = False
-                    break
-                if in_runreqs:
-                    if runreqs_spacing == line[: -len(line.lstrip())]:
-                        in_runreqs = False
-                        continue
-                    if is_selector_line(line):
-                        no_arch_possible = False
-                        break
-            if no_arch_possible:
-                hints.append(
-                    "Whenever possible python packages should use noarch. "
-                    "See https://conda-forge.org/docs/maintainer/knowledge_base.html#noarch-builds"
-                )
 
-    return lints, hints
+@rule("H2")
+def _hint_noarch(recipe, lints, hints):
+    """Suggest python noarch (skip on feedstocks)."""
+    build_reqs = recipe.build_reqs
+    if (
+        recipe.build_section.get("noarch") is None
+        and build_reqs
+        and not any(["_compiler_stub" in b for b in build_reqs])
+        and ("pip" in build_reqs)
+        and (recipe.is_staged_recipes or not recipe.conda_forge)
+    ):
+        if not any(map(is_arch_specific_line, recipe.recipe_lines or ())):
+            hints.append(
+                "Whenever possible python packages should use noarch. "
+                "See https://conda-forge.org/docs/maintainer/knowledge_base.html#noarch-builds"
+            )
+
+
+def recipe_maintainers(meta):
+    """The maintainers of the recipe, if they are listed as they should be."""
+    extra_section = meta.get("extra", {})
+    if not isinstance(extra_section, Mapping):
+        return []
+    maintainers = extra_section.get("recipe-maintainers", [])
+    if not isinstance(maintainers, Sequence) or isinstance(maintainers, str):
+        return []
+    return [m for m in maintainers if isinstance(m, str)]
+
+
+def prefetch_maintainers(recipe_dirs, map_func=map):
+    """Check the maintainers of all the recipes at once, ahead of linting them.
+
+    The answers are cached by ``github_users``, so that linting the recipes, e.g. in
+    worker processes, does not ask GitHub again.  The recipes are read with ``map_func``.
+    """
+    if "GH_TOKEN" not in os.environ:
+        return {}
+    logins = itertools.chain.from_iterable(map_func(_read_maintainers, recipe_dirs))
+    return github_users.check_logins(logins, os.environ["GH_TOKEN"])
+
+
+def _read_maintainers(recipe_dir):
+    try:
+        return recipe_maintainers(MetaData(os.path.abspath(recipe_dir)).meta)
+    except Exception:
+        # the recipe is linted, and the error reported, later
+        return []
 
 
 def run_conda_forge_specific(meta, recipe_dir, lints, hints):
-    gh = github.Github(os.environ["GH_TOKEN"])
+    token = os.environ["GH_TOKEN"]
+    gh = github_users.github_client(token)
     package_section = get_section(meta, "package", lints)
     extra_section = get_section(meta, "extra", lints)
     recipe_dirname = os.path.basename(recipe_dir) if recipe_dir else "recipe"
@@ -494,13 +726,12 @@ def run_conda_forge_specific(meta, recipe_dir, lints, hints):
 
     # 2: Check that the recipe maintainers exists:
     maintainers = extra_section.get("recipe-maintainers", [])
+    # Teams are not checked, checking for their existence is expensive.
+    exists = github_users.check_logins(maintainers, token)
     for maintainer in maintainers:
         if "/" in maintainer:
-            # It's a team. Checking for existence is expensive. Skip for now
             continue
-        try:
-            gh.get_user(maintainer)
-        except github.UnknownObjectException:
+        if not exists[maintainer]:
             lints.append(
                 'Recipe maintainer "{}" does not exist'.format(maintainer)
             )
@@ -513,6 +744,57 @@ def run_conda_forge_specific(meta, recipe_dir, lints, hints):
         )
 
 
+RecipeLine = namedtuple(
+    "RecipeLine", ["number", "text", "indent", "selector", "jinja", "section"]
+)
+RecipeLine.__doc__ = """A line of meta.yaml, as seen by the line based lints.
+
+``number`` is 0-based and ``text`` is the line without its line ending.  ``selector``
+and ``jinja`` tell whether the line has a selector or is a Jinja2 variable definition.
+``section`` is the ``host`` or ``run`` requirements block the line is in, or ``None``.
+"""
+
+
+def read_recipe_lines(meta_fname):
+    """Read meta.yaml in a single pass, into a list of :class:`RecipeLine`."""
+    with io.open(meta_fname, "rt") as fh:
+        texts = fh.read().split("\n")
+
+    recipe_lines = []
+    section = None
+    for number, text in enumerate(texts):
+        stripped = text.strip()
+        # blank lines are not indented
+        indent = text[: len(text) - len(text.lstrip())] if stripped else ""
+        if stripped == "host:" or stripped == "run:":
+            section = stripped[:-1]
+            section_indent = indent
+            line_section = None
+        elif section is not None and indent == section_indent:
+            # the line ending the block is not part of it
+            section = line_section = None
+        else:
+            line_section = section
+        recipe_lines.append(
+            RecipeLine(
+                number=number,
+                text=text,
+                indent=indent,
+                selector=is_selector_line(text),
+                jinja=is_jinja_line(text),
+                section=line_section,
+            )
+        )
+    return recipe_lines
+
+
+def is_arch_specific_line(line):
+    """Whether the :class:`RecipeLine` has a selector that rules out ``noarch``."""
+    if not line.selector:
+        return False
+    return line.section is not None or line.text.strip().startswith("skip:")
+
+
 def is_selector_line(line):
     # Using the same pattern defined in conda-build (metadata.py),
     # we identify selectors.
@@ -547,14 +829,101 @@ def jinja_lines(lines):
             yield line, i
 
 
-def main(recipe_dir, conda_forge=False, return_hints=False):
+def main(
+    recipe_dir,
+    conda_forge=False,
+    return_hints=False,
+    select=None,
+    ignore=None,
+    profile=None,
+):
     recipe_dir = os.path.abspath(recipe_dir)
     if not os.path.exists(recipe_dir):
         raise IOError("Feedstock directory does not exist.")
 
     meta = MetaData(recipe_dir).meta
-    results, hints = lintify(meta, recipe_dir, conda_forge)
+    results, hints = lintify(
+        meta, recipe_dir, conda_forge, select=select, ignore=ignore, profile=profile
+    )
     if return_hints:
         return results, hints
     else:
         return results
+
+
+def parse_rule_ids(value):
+    """Split comma separated rule ids, as given on the command line."""
+    return [rule_id.strip() for rule_id in value.split(",") if rule_id.strip()]
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Lint NWB extension recipes.")
+    parser.add_argument("--conda-forge", action="store_true")
+    parser.add_argument(
+        "--select",
+        type=parse_rule_ids,
+        default=None,
+        help="Comma separated ids of the rules to run, e.g. L6,L20, or L or H for "
+        "all the lints or hints.  All the rules are run by default.",
+    )
+    parser.add_argument(
+        "--ignore",
+        type=parse_rule_ids,
+        default=None,
+        help="Comma separated ids of the rules not to run.",
+    )
+    parser.add_argument(
+        "--profile-rules",
+        action="store_true",
+        help="Report the time spent in every rule, across all the recipes.",
+    )
+    parser.add_argument(
+        "--list-rules", action="store_true", help="List the rules, and exit."
+    )
+    parser.add_argument("recipe_directory", default=[os.getcwd()], nargs="*")
+    args = parser.parse_args()
+
+    if args.list_rules:
+        for lint_rule in RULES.values():
+            print(
+                "{:<6} {:<5} {}".format(
+                    lint_rule.id, lint_rule.kind, lint_rule.description
+                )
+            )
+        sys.exit(0)
+    try:
+        select_rules(args.select, args.ignore)
+    except ValueError as e:
+        parser.error(str(e))
+
+    profile = RuleProfile() if args.profile_rules else None
+    all_good = True
+    for recipe in args.recipe_directory:
+        lints, hints = main(
+            recipe,
+            conda_forge=args.conda_forge,
+            return_hints=True,
+            select=args.select,
+            ignore=args.ignore,
+            profile=profile,
+        )
+        if lints:
+            all_good = False
+            print("{} has some lint:\n  {}".format(recipe, "\n  ".join(lints)))
+            if hints:
+                print(
+                    "{} also has some suggestions:\n  {}".format(
+                        recipe, "\n  ".join(hints)
+                    )
+                )
+        elif hints:
+            print("{} has some suggestions:\n  {}".format(recipe, "\n  ".join(hints)))
+        else:
+            print("{} is in fine form".format(recipe))
+    if profile is not None:
+        print(profile.report())
+    # Exit code 1 for some lint, 0 for no lint.
+    sys.exit(int(not all_good))
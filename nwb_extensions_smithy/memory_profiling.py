@@ -0,0 +1,281 @@
+"""Opt-in memory instrumentation for rerenders.
+
+A ``MemoryProfiler`` records, for every named phase of a rerender, the wall time, the
+resident set size (RSS) and the tracemalloc peak, together with the source lines that
+allocated the most memory while the phase was running.  It can also enforce a memory
+ceiling: a watchdog thread samples the RSS and, when the ceiling is crossed, the
+rerender is aborted with a ``MemoryLimitExceeded`` error carrying the report, instead of
+being killed by the kernel's OOM killer without any hint of what was going on.
+
+Phases are entered through ``MemoryProfiler.phase`` while the profiler is running, see
+``profiling``.  A profiler measures a single rerender at a time.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+import _thread
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+
+class MemoryLimitExceeded(RuntimeError):
+    pass
+
+
+# keep the bookkeeping of the profiler itself out of the allocator statistics
+_snapshot_filters = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+)
+
+
+def _take_snapshot():
+    return tracemalloc.take_snapshot().filter_traces(_snapshot_filters)
+
+
+def parse_size(size):
+    """Parse a memory size like ``2048``, ``512M`` or ``4G`` into bytes."""
+    if size is None or isinstance(size, int):
+        return size
+    m = re.match(r"^\s*(\d+(?:\.\d+)?)\s*([kmgt]?)i?b?\s*$", str(size), re.I)
+    if not m:
+        raise ValueError("Cannot parse memory size {!r}".format(size))
+    factor = 1024 ** " kmgt".index(m.group(2).lower() or " ")
+    return int(float(m.group(1)) * factor)
+
+
+def format_size(size):
+    if size is None:
+        return "n/a"
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(size) < 1024:
+            return "{:.1f} {}".format(size, unit)
+        size /= 1024.0
+    return "{:.1f} TiB".format(size)
+
+
+def current_rss():
+    """The current resident set size of this process in bytes, if it can be determined."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (IOError, OSError, ValueError, IndexError):
+        return peak_rss()
+
+
+def peak_rss():
+    """The peak resident set size of this process in bytes, if it can be determined."""
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes, macOS bytes
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+class PhaseStats(object):
+    """Aggregated measurements of all runs of one named phase."""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self.rss_peak = None
+        self.traced_peak = 0
+        self.top_allocators = []
+
+    def update(self, seconds, rss_peak, traced_peak, top_allocators):
+        self.calls += 1
+        self.seconds += seconds
+        if rss_peak is not None:
+            self.rss_peak = max(self.rss_peak or 0, rss_peak)
+        if traced_peak >= self.traced_peak:
+            # keep the allocators of the most expensive run of this phase
+            self.traced_peak = traced_peak
+            self.top_allocators = top_allocators
+
+
+class _ActivePhase(object):
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.rss_peak = current_rss()
+        self.traced_peak = 0
+        self.snapshot = None
+
+
+class MemoryProfiler(object):
+    """Collect per-phase memory usage and optionally enforce a memory ceiling.
+
+    Parameters
+    ----------
+    limit : int or str, optional
+        Abort with ``MemoryLimitExceeded`` once the RSS of the process exceeds this many
+        bytes.  Strings like ``"4G"`` are accepted.
+    top : int
+        Number of top allocating source lines to report per phase.
+    interval : float
+        Seconds between two RSS samples of the watchdog thread.
+    """
+
+    def __init__(self, limit=None, top=5, interval=0.05):
+        self.limit = parse_size(limit)
+        self.top = top
+        self.interval = interval
+        self.phases = OrderedDict()
+        self.exceeded = None
+        self._stack = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watchdog = None
+        self._main_thread = None
+        self._started_tracemalloc = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._main_thread = threading.get_ident()
+        self._stop.clear()
+        self._watchdog = threading.Thread(
+            target=self._watch, name="smithy-memory-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            rss = current_rss()
+            if rss is None:
+                continue
+            with self._lock:
+                for active in self._stack:
+                    active.rss_peak = max(active.rss_peak or 0, rss)
+                if self.limit is None or self.exceeded is not None or rss <= self.limit:
+                    continue
+                self.exceeded = (
+                    self._stack[-1].name if self._stack else "<no phase>",
+                    rss,
+                )
+            # raises KeyboardInterrupt in the thread that started profiling, which is turned
+            #    into MemoryLimitExceeded in ``phase``
+            if self._main_thread == threading.main_thread().ident:
+                _thread.interrupt_main()
+
+    def check(self):
+        """Raise ``MemoryLimitExceeded`` if the ceiling has been crossed."""
+        if self.exceeded is not None:
+            name, rss = self.exceeded
+            raise MemoryLimitExceeded(
+                "Memory limit of {} exceeded ({}) during phase {!r}.\n{}".format(
+                    format_size(self.limit), format_size(rss), name, self.report()
+                )
+            )
+
+    @contextmanager
+    def phase(self, name):
+        self.check()
+        active = _ActivePhase(name)
+        with self._lock:
+            if self._stack:
+                # nested phases share the tracemalloc peak with their parent
+                parent = self._stack[-1]
+                parent.traced_peak = max(
+                    parent.traced_peak, tracemalloc.get_traced_memory()[1]
+                )
+            self._stack.append(active)
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        active.snapshot = _take_snapshot()
+        try:
+            yield
+        except KeyboardInterrupt:
+            if self.exceeded is None:
+                raise
+        finally:
+            self._finish(active)
+        self.check()
+
+    def _finish(self, active):
+        traced_peak = max(active.traced_peak, tracemalloc.get_traced_memory()[1])
+        stats = _take_snapshot().compare_to(active.snapshot, "lineno")
+        top_allocators = [
+            "{}:{}: +{}".format(
+                stat.traceback[0].filename,
+                stat.traceback[0].lineno,
+                format_size(stat.size_diff),
+            )
+            for stat in stats[: self.top]
+            if stat.size_diff > 0
+        ]
+        with self._lock:
+            self._stack.remove(active)
+            if self._stack:
+                parent = self._stack[-1]
+                parent.traced_peak = max(parent.traced_peak, traced_peak)
+                parent.rss_peak = max(parent.rss_peak or 0, active.rss_peak or 0)
+            rss_peak = max(active.rss_peak or 0, current_rss() or 0) or None
+            if active.name not in self.phases:
+                self.phases[active.name] = PhaseStats(active.name)
+            self.phases[active.name].update(
+                time.perf_counter() - active.start,
+                rss_peak,
+                traced_peak,
+                top_allocators,
+            )
+
+    def report(self):
+        lines = [
+            "Memory usage per rerender phase (process peak RSS: {})".format(
+                format_size(peak_rss())
+            ),
+            "{:<40} {:>6} {:>10} {:>14} {:>14}".format(
+                "phase", "calls", "seconds", "peak RSS", "traced peak"
+            ),
+        ]
+        for stats in self.phases.values():
+            lines.append(
+                "{:<40} {:>6} {:>10.2f} {:>14} {:>14}".format(
+                    stats.name,
+                    stats.calls,
+                    stats.seconds,
+                    format_size(stats.rss_peak),
+                    format_size(stats.traced_peak),
+                )
+            )
+            for allocator in stats.top_allocators:
+                lines.append("    " + allocator)
+        return "\n".join(lines)
+
+
+@contextmanager
+def profiling(profiler):
+    """Run ``profiler`` for the duration of the block.  ``None`` disables profiling."""
+    if profiler is None:
+        yield
+        return
+    profiler.start()
+    try:
+        yield profiler
+    except KeyboardInterrupt:
+        # the watchdog may fire in between two phases
+        if profiler.exceeded is None:
+            raise
+        profiler.check()
+    finally:
+        profiler.stop()
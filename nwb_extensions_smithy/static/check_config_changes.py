@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+"""Tell whether a pull request leaves the given configs of a feedstock unaffected.
+
+This script is copied into ``.ci_support`` by nwb-extensions-smithy when the
+``skip_unchanged_configs`` option is set, next to the ``dependency_manifest.json``
+that lists what every config depends on.  Usage::
+
+    python check_config_changes.py [--azure] <config> [<config> ...]
+
+It exits with 0 if none of the configs is affected by the changes of the pull
+request being built, so that the job can stop early, and with 1 otherwise.  With
+``--azure`` it always exits with 0, and sets the pipeline variable
+``CONFIG_UNCHANGED`` to ``true`` instead.
+
+A config is affected by:
+
+* a change of one of the variant keys it uses in its ``.ci_support/<config>.yaml``,
+* an edit of ``recipe/meta.yaml`` or ``recipe/conda_build_config.yaml`` that changes
+  its rendered metadata, compared with the manifest of the base of the pull request,
+* a change of one of the other recipe files it uses.
+
+Anything it cannot make sense of, e.g. a build that is not a merge commit of a
+pull request, a manifest that was not rendered from the recipe of the pull request
+or a changed file that is not in the manifest, counts as affecting every config.
+Runs with python 2.7 and 3.
+"""
+import json
+import os
+import subprocess
+import sys
+
+FEEDSTOCK_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MANIFEST_PATH = ".ci_support/dependency_manifest.json"
+MANIFEST = os.path.join(FEEDSTOCK_ROOT, MANIFEST_PATH)
+
+# files that never change the outcome of a build
+IGNORED_PREFIXES = ("README.md", "LICENSE.txt", ".github/")
+IGNORED_CI_SUPPORT_FILES = (
+    "README",
+    "dependency_manifest.json",
+    "check_config_changes.py",
+    "ff_ci_pr_build.py",
+    "ff_ci_pr_build.ref",
+)
+# the recipe files whose effect on a config is known from its rendered metadata
+RENDERED_RECIPE_FILES = ("recipe/meta.yaml", "recipe/conda_build_config.yaml")
+
+
+def git(*args):
+    with open(os.devnull, "w") as devnull:
+        return subprocess.check_output(
+            ("git",) + args, cwd=FEEDSTOCK_ROOT, stderr=devnull
+        ).decode("utf-8")
+
+
+def git_show(rev, path):
+    """The content of ``path`` at ``rev``, or ``None`` if it has no such file."""
+    try:
+        return git("show", "{}:{}".format(rev, path))
+    except subprocess.CalledProcessError:
+        return None
+
+
+def changed_files():
+    """The files changed by the pull request, if the build is a merge commit of one."""
+    parents = git("rev-list", "--parents", "-n", "1", "HEAD")
+    if len(parents.split()) != 3:
+        return None
+    output = git("diff", "--name-only", "HEAD^1", "HEAD")
+    return [line for line in output.splitlines() if line]
+
+
+def rendered_from(rev, manifest):
+    """Whether ``manifest`` was rendered from the recipe files of ``rev``."""
+    recorded = manifest.get("rendered_from")
+    if not recorded:
+        return False
+    for path, blob in recorded.items():
+        try:
+            current = git("rev-parse", "{}:{}".format(rev, path)).strip()
+        except subprocess.CalledProcessError:
+            current = None
+        if current != blob:
+            return False
+    return True
+
+
+def top_level_values(text):
+    """The text of the value of every top level key of a variant config file."""
+    values = {}
+    key = None
+    for line in text.splitlines():
+        if line and not line[0].isspace() and line[0] not in "-#" and ":" in line:
+            key, _, rest = line.partition(":")
+            values[key] = [rest.strip()]
+        elif key is not None:
+            values[key].append(line)
+    return values
+
+
+def changed_keys(old, new):
+    """The top level keys that differ between two versions of a variant config file."""
+    if old is None or new is None:
+        return None
+    old, new = top_level_values(old), top_level_values(new)
+    return set(key for key in set(old) | set(new) if old.get(key) != new.get(key))
+
+
+def affected(
+    config_name,
+    paths,
+    manifest,
+    base_manifest=None,
+    variant_changes=None,
+    rendered_current=False,
+):
+    """Whether the changes of ``paths`` affect the config.
+
+    ``base_manifest`` is the manifest of the base of the pull request,
+    ``variant_changes`` maps the changed variant config files to their changed keys,
+    and ``rendered_current`` tells whether both manifests were rendered from the recipe
+    of their commit.
+    """
+    configs = manifest["configs"]
+    if config_name not in configs:
+        return True
+    config = configs[config_name]
+    base_configs = (base_manifest or {}).get("configs", {})
+    variant_changes = variant_changes or {}
+    for path in paths:
+        if path.startswith(IGNORED_PREFIXES):
+            continue
+        if path in RENDERED_RECIPE_FILES:
+            base_config = base_configs.get(config_name)
+            if (
+                not rendered_current
+                or base_config is None
+                or base_config.get("rendered") != config.get("rendered")
+            ):
+                return True
+            continue
+        if path.startswith(".ci_support/"):
+            fname = path[len(".ci_support/"):]
+            if fname in IGNORED_CI_SUPPORT_FILES:
+                continue
+            name = fname[: -len(".yaml")] if fname.endswith(".yaml") else None
+            if name in configs:
+                # the variant of another config changed
+                if name != config_name:
+                    continue
+                keys = variant_changes.get(path)
+                if keys is None:
+                    return True
+                used = set(config.get("variant_keys", ()))
+                used.update(base_configs.get(config_name, {}).get("variant_keys", ()))
+                if keys & used:
+                    return True
+                continue
+            if name and name.startswith("clobber_") and name[len("clobber_"):] in configs:
+                if name[len("clobber_"):] == config_name:
+                    return True
+                continue
+            return True
+        if path in config["files"]:
+            return True
+        if not any(path in other["files"] for other in configs.values()):
+            # a file that no config is known to depend on
+            return True
+    return False
+
+
+def main(argv=None):
+    args = list(sys.argv[1:] if argv is None else argv)
+    azure = "--azure" in args
+    config_names = [arg for arg in args if arg != "--azure"]
+
+    try:
+        paths = changed_files()
+        with open(MANIFEST) as fh:
+            manifest = json.load(fh)
+        if paths is not None:
+            base = git_show("HEAD^1", MANIFEST_PATH)
+            base_manifest = json.loads(base) if base is not None else None
+            rendered_current = (
+                base_manifest is not None
+                and rendered_from("HEAD", manifest)
+                and rendered_from("HEAD^1", base_manifest)
+            )
+            variant_changes = dict(
+                (path, changed_keys(git_show("HEAD^1", path), git_show("HEAD", path)))
+                for path in paths
+                if path.startswith(".ci_support/") and path.endswith(".yaml")
+            )
+    except Exception as e:
+        print("Cannot determine the changes of this build: {}".format(e))
+        paths = None
+
+    if paths is None:
+        unchanged = False
+    else:
+        unchanged = not any(
+            affected(
+                name,
+                paths,
+                manifest,
+                base_manifest,
+                variant_changes,
+                rendered_current,
+            )
+            for name in config_names
+        )
+
+    if unchanged:
+        print(
+            "{} not affected by the changes of this pull request, "
+            "skipping.".format(", ".join(config_names))
+        )
+    if azure:
+        if unchanged:
+            print("##vso[task.setvariable variable=CONFIG_UNCHANGED]true")
+        return 0
+    return 0 if unchanged else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,6 +2,8 @@ import shutil
 import tempfile
 import jinja2
 import datetime
+import json
+import threading
 import time
 import os
 from pathlib import Path
@@ -10,6 +12,11 @@ from contextlib import contextmanager
 
 import ruamel.yaml
 
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+
 
 # define global yaml API
 # roundrip-loader and allowing duplicate keys
@@ -89,3 +96,97 @@ def update_conda_forge_config(feedstock_directory):
     yield code
 
     yaml.dump(code, Path(forge_yaml))
+
+
+class JSONFileCache(object):
+    """A small persistent cache of JSON values that expire after ``ttl`` seconds.
+
+    The entries are kept in memory and written back to the JSON file at ``path`` whenever
+    they change, so that they survive the process.  The file is read again and merged
+    under a lock file before it is rewritten, so processes sharing the cache do not lose
+    each other's entries.  A missing, unreadable or corrupted file is treated as an empty
+    cache, and failing to write it only loses the persistence.
+    """
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as fh:
+                entries = json.load(fh)
+            if not isinstance(entries, dict):
+                raise ValueError(self.path)
+        except (IOError, ValueError):
+            entries = {}
+        return entries
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = self._read()
+        return self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._load().get(key)
+        if not entry or time.time() - entry[0] > self.ttl:
+            return default
+        return entry[1]
+
+    def __contains__(self, key):
+        marker = object()
+        return self.get(key, marker) is not marker
+
+    def update(self, values):
+        now = time.time()
+        with self._lock, self._file_lock():
+            # the entries other processes wrote since the file was loaded are kept
+            entries = self._read()
+            entries.update((key, [now, value]) for key, value in values.items())
+            # drop what has expired, the file is rewritten anyway
+            for key in [k for k, v in entries.items() if now - v[0] > self.ttl]:
+                del entries[key]
+            self._entries = entries
+            self._dump(entries)
+
+    def __setitem__(self, key, value):
+        self.update({key: value})
+
+    @contextmanager
+    def _file_lock(self):
+        """Hold an exclusive lock on ``path + ".lock"`` across processes, if possible."""
+        fh = None
+        if fcntl is not None:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                fh = open(self.path + ".lock", "a")
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            except OSError:
+                if fh is not None:
+                    fh.close()
+                fh = None
+        try:
+            yield
+        finally:
+            if fh is not None:
+                # closing the file releases the lock
+                fh.close()
+
+    def _dump(self, entries):
+        cache_dir = os.path.dirname(os.path.abspath(self.path))
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        except OSError:
+            return
+        try:
+            # written next to the cache and renamed, concurrent readers never see half
+            #     of it
+            with os.fdopen(fd, "w") as fh:
+                json.dump(entries, fh)
+            os.replace(tmp_path, self.path)
+        except (OSError, ValueError):
+            os.remove(tmp_path)
@@ -0,0 +1,171 @@
+"""Rerender a feedstock whenever its inputs change.
+
+``watch`` keeps a single process, and with it the imported conda-build, the loaded channel
+index and the rendered recipe, alive between rerenders.  It watches the recipe, the
+``conda-forge.yml``, the feedstock templates and the migrations, and only renders the
+recipe with conda-build again when something other than a template changed.
+
+inotify is used to wait for changes when the ``inotify_simple`` package is available,
+otherwise the watched files are polled.
+"""
+import logging
+import os
+import time
+
+from . import configure_feedstock
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+
+logger = logging.getLogger(__name__)
+
+WATCHED_PATHS = (
+    "recipe",
+    "conda-forge.yml",
+    "templates",
+    os.path.join(".ci_support", "migrations"),
+)
+
+# changes to these only affect the rendering of the templates
+TEMPLATE_PATHS = ("templates",)
+
+
+def snapshot(forge_dir):
+    """Map every watched file of the feedstock to its modification time and size."""
+    state = {}
+    for watched in WATCHED_PATHS:
+        path = os.path.join(forge_dir, watched)
+        if os.path.isfile(path):
+            paths = [path]
+        else:
+            paths = (
+                os.path.join(root, fname)
+                for root, _, fnames in os.walk(path)
+                for fname in fnames
+            )
+        for fpath in paths:
+            try:
+                st = os.stat(fpath)
+            except OSError:
+                # removed while walking
+                continue
+            state[os.path.relpath(fpath, forge_dir)] = (st.st_mtime_ns, st.st_size)
+    return state
+
+
+def changed_paths(old, new):
+    return sorted(
+        path for path in set(old) | set(new) if old.get(path) != new.get(path)
+    )
+
+
+def templates_only(paths):
+    """Whether a rerender for the changed ``paths`` can reuse the conda-build renders."""
+    return all(path.split(os.sep, 1)[0] in TEMPLATE_PATHS for path in paths)
+
+
+class _PollingWaiter(object):
+    def __init__(self, forge_dir, interval):
+        self.interval = interval
+
+    def wait(self):
+        time.sleep(self.interval)
+
+    def close(self):
+        pass
+
+
+class _InotifyWaiter(object):
+    _flags = None
+
+    def __init__(self, forge_dir, interval):
+        flags = inotify_simple.flags
+        self._flags = (
+            flags.CREATE
+            | flags.DELETE
+            | flags.MODIFY
+            | flags.MOVED_FROM
+            | flags.MOVED_TO
+            | flags.CLOSE_WRITE
+        )
+        self.forge_dir = forge_dir
+        self.interval = interval
+        self.inotify = inotify_simple.INotify()
+
+    def _add_watches(self):
+        # Directories may have been created since the last change, watching an already
+        #     watched directory again is a no-op.
+        self.inotify.add_watch(self.forge_dir, self._flags)
+        for watched in WATCHED_PATHS:
+            path = os.path.join(self.forge_dir, watched)
+            for root, _, _ in os.walk(path):
+                try:
+                    self.inotify.add_watch(root, self._flags)
+                except OSError:
+                    continue
+
+    def wait(self):
+        self._add_watches()
+        # Events only wake us up, the snapshots tell what changed.  The read delay
+        #     collects the burst of events of a single save of an editor.
+        self.inotify.read(
+            timeout=int(self.interval * 1000 * 10), read_delay=int(self.interval * 1000)
+        )
+
+    def close(self):
+        self.inotify.close()
+
+
+def _rerender(forge_dir, context, rerender_kwargs):
+    try:
+        configure_feedstock.main(forge_dir, context=context, **rerender_kwargs)
+    except Exception as e:
+        # a broken recipe in the middle of an edit should not end the session
+        logger.error("Rerender failed: %s", e, exc_info=True)
+
+
+def watch(forge_file_directory, interval=0.5, max_rerenders=None, **rerender_kwargs):
+    """Rerender the feedstock now and every time one of its inputs changes.
+
+    ``rerender_kwargs`` are passed on to ``configure_feedstock.main``.  Stop with Ctrl-C, or
+    after ``max_rerenders`` rerenders.
+    """
+    forge_dir = os.path.abspath(forge_file_directory)
+    context = configure_feedstock.RenderContext(keep_renders=True)
+    if inotify_simple is None:
+        logger.info(
+            "Polling for changes every %ss, install inotify_simple to use inotify "
+            "instead",
+            interval,
+        )
+        waiter = _PollingWaiter(forge_dir, interval)
+    else:
+        logger.info("Waiting for changes with inotify")
+        waiter = _InotifyWaiter(forge_dir, interval)
+
+    state = snapshot(forge_dir)
+    _rerender(forge_dir, context, rerender_kwargs)
+    rerenders = 1
+    try:
+        while max_rerenders is None or rerenders < max_rerenders:
+            waiter.wait()
+            new_state = snapshot(forge_dir)
+            paths = changed_paths(state, new_state)
+            if not paths:
+                continue
+            state = new_state
+            if templates_only(paths):
+                logger.info("Templates changed, rerendering without conda-build")
+            else:
+                logger.info("%s changed, rerendering", ", ".join(paths))
+                context.invalidate_renders()
+            _rerender(forge_dir, context, rerender_kwargs)
+            rerenders += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        waiter.close()
+    return rerenders
@@ -24,6 +24,10 @@ def main():
         # As nwb-extensions-smithy has resources as part of the codebase, it is
         # not zip-safe.
         zip_safe=False,
+        extras_require={
+            # waits for changes with inotify instead of polling in watch mode
+            "watch": ["inotify_simple"],
+        },
         cmdclass=versioneer.get_cmdclass(),
     )
     setup(**skw)
@@ -0,0 +1,123 @@
+import json
+
+import pytest
+import requests
+
+from nwb_extensions_smithy import azure_build_ids
+from nwb_extensions_smithy.utils import JSONFileCache
+
+
+class FakeResponse(object):
+    def __init__(self, definitions, continuation_token=None):
+        self._definitions = definitions
+        self.headers = {}
+        if continuation_token:
+            self.headers["x-ms-continuationtoken"] = continuation_token
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"value": self._definitions}
+
+
+@pytest.fixture
+def cache(tmpdir, monkeypatch):
+    monkeypatch.setattr(azure_build_ids, "_unreachable", {})
+    return JSONFileCache(str(tmpdir.join("build_ids.json")), ttl=60)
+
+
+def test_get_build_id_lists_the_project_once(cache, monkeypatch):
+    calls = []
+
+    def get(url, params, timeout):
+        calls.append(dict(params))
+        assert timeout <= azure_build_ids.TIMEOUT
+        if "continuationToken" not in params:
+            return FakeResponse([{"name": "a-feedstock", "id": 1}], "next")
+        return FakeResponse([{"name": "b-feedstock", "id": 2}])
+
+    monkeypatch.setattr(requests, "get", get)
+    assert azure_build_ids.get_build_id("org", "proj", "a-feedstock", cache=cache) == 1
+    assert azure_build_ids.get_build_id("org", "proj", "b-feedstock", cache=cache) == 2
+    # not registered yet, known from the listing
+    assert azure_build_ids.get_build_id("org", "proj", "c-feedstock", cache=cache) is None
+    assert len(calls) == 2
+
+    # the cache persists
+    with open(cache.path) as fh:
+        assert json.load(fh)["org/proj/b-feedstock"][1] == 2
+    other_cache = JSONFileCache(cache.path, ttl=60)
+    assert azure_build_ids.get_build_id("org", "proj", "a-feedstock", cache=other_cache) == 1
+    assert len(calls) == 2
+
+
+def test_get_build_id_unreachable(cache, monkeypatch):
+    calls = []
+
+    def get(url, params, timeout):
+        calls.append(params.get("name"))
+        raise requests.Timeout("hanging")
+
+    monkeypatch.setattr(requests, "get", get)
+    assert azure_build_ids.get_build_id("org", "proj", "a-feedstock", cache=cache) is None
+    # the project is not listed again, only the definition is looked up by name
+    assert azure_build_ids.get_build_id("org", "proj", "b-feedstock", cache=cache) is None
+    assert calls == [None, "a-feedstock", "b-feedstock"]
+
+
+def test_get_build_id_by_name(cache, monkeypatch):
+    calls = []
+    timeouts = []
+    now = [1000.0]
+
+    def get(url, params, timeout):
+        calls.append(params.get("name"))
+        timeouts.append(timeout)
+        if "name" not in params:
+            raise requests.Timeout("too many definitions")
+        return FakeResponse([{"name": params["name"], "id": 3}])
+
+    monkeypatch.setattr(requests, "get", get)
+    monkeypatch.setattr(azure_build_ids.time, "monotonic", lambda: now[0])
+    assert azure_build_ids.get_build_id("org", "proj", "a-feedstock", cache=cache) == 3
+    assert azure_build_ids.get_build_id("org", "proj", "a-feedstock", cache=cache) == 3
+    assert calls == [None, "a-feedstock"]
+    # the rerender waits for the listing and the lookup by name
+    assert sum(timeouts) <= azure_build_ids.LOOKUP_TIMEOUT
+
+    # the listing is tried again once the failure expired
+    now[0] += azure_build_ids.UNREACHABLE_TTL
+    assert azure_build_ids.get_build_id("org", "proj", "b-feedstock", cache=cache) == 3
+    assert calls == [None, "a-feedstock", None, "b-feedstock"]
+
+
+def test_json_file_cache_expires(tmpdir, monkeypatch):
+    cache = JSONFileCache(str(tmpdir.join("sub", "cache.json")), ttl=10)
+    now = [1000.0]
+    monkeypatch.setattr(azure_build_ids.time, "time", lambda: now[0])
+    cache["key"] = "value"
+    assert cache.get("key") == "value"
+    assert "key" in cache
+    now[0] += 11
+    assert cache.get("key") is None
+    assert "key" not in cache
+
+    tmpdir.join("corrupted.json").write("{not json")
+    assert JSONFileCache(str(tmpdir.join("corrupted.json")), ttl=10).get("key") is None
+
+
+def test_json_file_cache_merges_writers(tmpdir):
+    path = str(tmpdir.join("cache.json"))
+    first = JSONFileCache(path, ttl=60)
+    second = JSONFileCache(path, ttl=60)
+    assert first.get("a") is None
+    assert second.get("b") is None
+    # each cache loaded the file before the other one wrote it
+    first["a"] = 1
+    second["b"] = 2
+    first["c"] = 3
+    with open(path) as fh:
+        assert sorted(json.load(fh)) == ["a", "b", "c"]
+    assert first.get("b") == 2
+    assert JSONFileCache(path, ttl=60).get("a") == 1
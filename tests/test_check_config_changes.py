@@ -0,0 +1,155 @@
+import importlib.util
+import os
+
+import pytest
+
+from nwb_extensions_smithy.configure_feedstock import conda_forge_content
+
+
+@pytest.fixture
+def check_config_changes():
+    spec = importlib.util.spec_from_file_location(
+        "check_config_changes",
+        os.path.join(conda_forge_content, "static", "check_config_changes.py"),
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+MANIFEST = {
+    "configs": {
+        "linux_64_python3.7": {
+            "files": ["recipe/build.sh"],
+            "variant_keys": ["docker_image", "python"],
+            "rendered": "linux",
+        },
+        "win_64_python3.7": {
+            "files": ["recipe/bld.bat", "recipe/win.patch"],
+            "variant_keys": ["python", "vc"],
+            "rendered": "win",
+        },
+    }
+}
+
+
+@pytest.mark.parametrize(
+    "paths, linux, win",
+    [
+        (["README.md", ".github/CODEOWNERS"], False, False),
+        (["recipe/meta.yaml"], True, True),
+        (["recipe/win.patch", "recipe/bld.bat"], False, True),
+        ([".ci_support/win_64_python3.7.yaml"], False, True),
+        ([".ci_support/dependency_manifest.json"], False, False),
+        (["recipe/helper.py"], True, True),
+        ([".azure-pipelines/build_steps.sh"], True, True),
+    ],
+)
+def test_affected(check_config_changes, paths, linux, win):
+    assert check_config_changes.affected("linux_64_python3.7", paths, MANIFEST) is linux
+    assert check_config_changes.affected("win_64_python3.7", paths, MANIFEST) is win
+
+
+def test_unknown_config_is_affected(check_config_changes):
+    assert check_config_changes.affected("osx_64_", ["README.md"], MANIFEST)
+
+
+def test_rendered_recipe_changes(check_config_changes):
+    base = {"configs": dict(MANIFEST["configs"])}
+    base["configs"]["win_64_python3.7"] = dict(
+        MANIFEST["configs"]["win_64_python3.7"], rendered="old win"
+    )
+
+    def affected(config_name, rendered_current=True, base_manifest=base):
+        return check_config_changes.affected(
+            config_name,
+            ["recipe/meta.yaml", "recipe/conda_build_config.yaml"],
+            MANIFEST,
+            base_manifest,
+            rendered_current=rendered_current,
+        )
+
+    # only the config whose rendered metadata changed is affected
+    assert not affected("linux_64_python3.7")
+    assert affected("win_64_python3.7")
+    # unless the manifests are not known to be rendered from their recipe
+    assert affected("linux_64_python3.7", rendered_current=False)
+    assert affected("linux_64_python3.7", base_manifest=None)
+
+
+def test_variant_key_changes(check_config_changes):
+    path = ".ci_support/win_64_python3.7.yaml"
+
+    def affected(keys):
+        return check_config_changes.affected(
+            "win_64_python3.7", [path], MANIFEST, variant_changes={path: keys}
+        )
+
+    assert affected({"vc"})
+    assert not affected({"numpy"})
+    assert not affected(set())
+    # a file that could not be compared
+    assert affected(None)
+
+
+def test_changed_keys(check_config_changes):
+    old = "python:\n- '3.7'\nvc:\n- '14'\nzip_keys:\n- - python\n  - vc\n"
+    new = "python:\n- '3.7'\nvc:\n- '15'\nzip_keys:\n- - python\n  - vc\n"
+    assert check_config_changes.changed_keys(old, new) == {"vc"}
+    assert check_config_changes.changed_keys(old, old + "numpy:\n- '1.16'\n") == {
+        "numpy"
+    }
+    assert check_config_changes.changed_keys(None, new) is None
+
+
+def test_main(check_config_changes, tmpdir, monkeypatch):
+    import json
+    import subprocess
+
+    from nwb_extensions_smithy.configure_feedstock import _git_blob_sha
+
+    root = str(tmpdir)
+    monkeypatch.setattr(check_config_changes, "FEEDSTOCK_ROOT", root)
+    monkeypatch.setattr(
+        check_config_changes,
+        "MANIFEST",
+        os.path.join(root, ".ci_support", "dependency_manifest.json"),
+    )
+
+    def git(*args):
+        subprocess.check_call(
+            ("git", "-c", "user.name=test", "-c", "user.email=test@test") + args,
+            cwd=root,
+        )
+
+    def commit(meta, rendered):
+        tmpdir.join("recipe", "meta.yaml").write(meta, ensure=True)
+        manifest = {
+            "configs": {
+                name: dict(config, rendered=rendered.get(name, config["rendered"]))
+                for name, config in MANIFEST["configs"].items()
+            },
+            "rendered_from": {
+                path: _git_blob_sha(os.path.join(root, path))
+                for path in check_config_changes.RENDERED_RECIPE_FILES
+            },
+        }
+        tmpdir.join(".ci_support", "dependency_manifest.json").write(
+            json.dumps(manifest), ensure=True
+        )
+        git("add", "-A")
+        git("commit", "-q", "-m", "commit")
+
+    git("init", "-q")
+    commit("test:\n  commands: [true]\n", {})
+    git("checkout", "-q", "-b", "pr")
+    # a test only change on windows
+    commit("test:\n  commands: [true]  # [win]\n", {"win_64_python3.7": "new win"})
+    git("checkout", "-q", "-")
+    git("merge", "-q", "--no-ff", "-m", "merge", "pr")
+
+    assert check_config_changes.main(["linux_64_python3.7"]) == 0
+    assert check_config_changes.main(["win_64_python3.7"]) == 1
+    # and without the merge commit of a pull request everything is affected
+    git("reset", "-q", "--hard", "HEAD^2")
+    assert check_config_changes.main(["linux_64_python3.7"]) == 1
@@ -1,12 +1,13 @@
 import argparse
 import collections
+import json
 import os
 import pytest
 import subprocess
 import yaml
 import shutil
 
-from nwb_extensions_smithy import cli
+from nwb_extensions_smithy import cli, lint_recipe
 
 _thisdir = os.path.abspath(os.path.dirname(__file__))
 
@@ -124,3 +125,47 @@ def test_regenerate(py_recipe, testing_workdir):
 
     # one py ver, no target_platform  (tests that older configs don't stick around)
     assert len(os.listdir(matrix_folder)) == 4
+
+
+RecipeLintArgs = collections.namedtuple(
+    "ArgsObject",
+    (
+        "recipe_directory",
+        "conda_forge",
+        "jobs",
+        "select",
+        "ignore",
+        "profile_rules",
+    ),
+)
+
+
+def test_recipe_lint_batch(monkeypatch, capsys):
+    def lint(recipe, conda_forge, return_hints, select, ignore, profile):
+        assert select == ["L"] and ignore is None
+        if recipe == "missing":
+            raise IOError("Feedstock directory does not exist.")
+        return (["some lint"] if recipe == "bad" else []), ["a hint"]
+
+    monkeypatch.setattr(lint_recipe, "main", lint)
+    parser = argparse.ArgumentParser()
+    subparser = parser.add_subparsers()
+    lint_obj = cli.RecipeLint(subparser)
+
+    args = RecipeLintArgs(
+        ["good", "bad", "missing", "good"], False, 1, ["L"], None, False
+    )
+    with pytest.raises(SystemExit) as e:
+        lint_obj(args)
+    assert e.value.code == 1
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [r["recipe"] for r in results] == ["good", "bad", "missing", "good"]
+    assert [r["lints"] for r in results] == [[], ["some lint"], [], []]
+    assert results[0]["hints"] == ["a hint"]
+    assert "does not exist" in results[2]["error"]
+    assert all(r["duration"] >= 0 for r in results)
+
+    args = RecipeLintArgs(["good", "good"], False, 1, ["L"], None, False)
+    with pytest.raises(SystemExit) as e:
+        lint_obj(args)
+    assert e.value.code == 0
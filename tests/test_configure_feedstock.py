@@ -186,6 +186,121 @@ def test_py_matrix_on_azure(py_recipe, jinja_env):
     assert len(os.listdir(matrix_dir)) == 8
 
 
+def test_pack_configs():
+    durations = {"a": 20, "b": 5, "c": 12, "d": 8, "e": 45}
+    jobs = cnfgr_fdstk.pack_configs(["a", "b", "c", "d", "e", "f"], durations, 30)
+    assert jobs == [["a", "d"], ["b", "c"], ["e"], ["f"]]
+
+
+def test_job_packing_azure(py_recipe, jinja_env):
+    cnfgr_fdstk.render_azure(
+        jinja_env=jinja_env, forge_config=py_recipe.config, forge_dir=py_recipe.recipe
+    )
+    linux_configs = sorted(
+        config_name
+        for config_name, platform, _, _ in py_recipe.config["configs"]
+        if platform.startswith("linux")
+    )
+    assert len(linux_configs) > 1
+    with open(os.path.join(py_recipe.recipe, "ci_durations.yml"), "w") as fh:
+        yaml.safe_dump({name: 5 for name in linux_configs}, fh)
+
+    py_recipe.config["azure"]["job_packing"] = {"max_minutes": 60}
+    cnfgr_fdstk.render_azure(
+        jinja_env=jinja_env, forge_config=py_recipe.config, forge_dir=py_recipe.recipe
+    )
+    with open(os.path.join(py_recipe.recipe, '.azure-pipelines', 'azure-pipelines-linux.yml')) as fp:
+        matrix = yaml.safe_load(fp)['jobs'][0]['strategy']['matrix']
+    assert len(matrix) == 1
+    (job,) = matrix.values()
+    assert job['CONFIGS'].split() == linux_configs
+    with open(os.path.join(py_recipe.recipe, '.azure-pipelines', 'build_steps.sh')) as fp:
+        assert 'for CONFIG in ${CONFIGS:-${CONFIG}}; do' in fp.read()
+
+
+def test_compact_matrix_azure(py_recipe, jinja_env):
+    py_recipe.config["azure"]["compact_matrix"] = True
+    cnfgr_fdstk.render_azure(
+        jinja_env=jinja_env, forge_config=py_recipe.config, forge_dir=py_recipe.recipe
+    )
+    linux_configs = sorted(
+        config_name
+        for config_name, platform, _, _ in py_recipe.config["configs"]
+        if platform.startswith("linux")
+    )
+    with open(os.path.join(py_recipe.recipe, '.azure-pipelines', 'azure-pipelines-linux.yml')) as fp:
+        linux = yaml.safe_load(fp)
+    assert linux['parameters']['configs'] == []
+    assert linux['parameters']['dockerImage'] == 'condaforge/linux-anvil-comp7'
+    assert '${{ each config in parameters.configs }}' in linux['jobs'][0]['strategy']['matrix']
+    with open(os.path.join(py_recipe.recipe, 'azure-pipelines.yml')) as fp:
+        templates = yaml.safe_load(fp)['jobs']
+    (linux_template,) = [
+        template for template in templates if template['template'].endswith('-linux.yml')
+    ]
+    assert linux_template['parameters'] == {'configs': linux_configs}
+
+    # only the variables that differ from the defaults are passed
+    forge_config = dict(
+        py_recipe.config,
+        configs=[
+            ('linux_64_a', 'linux-64', True, {'docker_image': ['condaforge/linux-anvil-comp7']}),
+            ('linux_64_b', 'linux-64', False, {'docker_image': ['other/image']}),
+        ],
+    )
+    assert cnfgr_fdstk._azure_matrix_jobs(forge_config, 'linux') == {
+        'configs': ['linux_64_a', 'linux_64_b'],
+        'overrides': {
+            'linux_64_b': {'UPLOAD_PACKAGES': 'False', 'DOCKER_IMAGE': 'other/image'}
+        },
+    }
+
+
+def test_conda_pkgs_cache_key(tmpdir):
+    ci_support = tmpdir.mkdir(".ci_support")
+    ci_support.join("linux_64_.yaml").write("python:\n- '3.7'\n")
+    key = cnfgr_fdstk.conda_pkgs_cache_key(str(tmpdir), ["linux_64_"])
+    assert key == cnfgr_fdstk.conda_pkgs_cache_key(str(tmpdir), ["linux_64_"])
+    ci_support.join("linux_64_.yaml").write("python:\n- '3.8'\n")
+    assert key != cnfgr_fdstk.conda_pkgs_cache_key(str(tmpdir), ["linux_64_"])
+
+
+def test_conda_pkgs_cache_azure(py_recipe, jinja_env):
+    py_recipe.config["conda_pkgs_cache"] = True
+    cnfgr_fdstk.render_azure(
+        jinja_env=jinja_env, forge_config=py_recipe.config, forge_dir=py_recipe.recipe
+    )
+    keys = py_recipe.config["conda_pkgs_cache_keys"]
+    with open(os.path.join(py_recipe.recipe, '.azure-pipelines', 'azure-pipelines-linux.yml')) as fp:
+        job = yaml.safe_load(fp)['jobs'][0]
+    for config_name, entry in job['strategy']['matrix'].items():
+        assert entry['CONDA_PKGS_CACHE_KEY'] == keys[config_name]
+    assert any(step.get('task') == 'Cache@2' for step in job['steps'])
+    with open(os.path.join(py_recipe.recipe, '.azure-pipelines', 'build_steps.sh')) as fp:
+        assert 'CONDA_PKGS_DIRS' in fp.read()
+
+
+def test_docker_image_cache(py_recipe, jinja_env):
+    py_recipe.config["docker"]["image_cache"] = True
+    cnfgr_fdstk.render_azure(
+        jinja_env=jinja_env, forge_config=py_recipe.config, forge_dir=py_recipe.recipe
+    )
+    with open(os.path.join(py_recipe.recipe, '.azure-pipelines', 'azure-pipelines-linux.yml')) as fp:
+        job = yaml.safe_load(fp)['jobs'][0]
+    cache_steps = [step for step in job['steps'] if step.get('task') == 'Cache@2']
+    assert cache_steps[0]['inputs']['key'] == (
+        'docker_image | "$(DOCKER_IMAGE)" | "$(DOCKER_IMAGE_DIGEST)"'
+    )
+    digest_step = job['steps'][job['steps'].index(cache_steps[0]) - 1]
+    assert 'DOCKER_IMAGE_DIGEST' in digest_step['script']
+    with open(os.path.join(py_recipe.recipe, '.azure-pipelines', 'run_docker_build.sh')) as fp:
+        script = fp.read()
+    # a restored image is not saved again
+    load = script.index('docker load -i "${DOCKER_IMAGE_CACHE}"')
+    save = script.index('docker save -o "${DOCKER_IMAGE_CACHE}" "${DOCKER_IMAGE}"')
+    assert load < script.index("else", load) < save
+
+
 def test_upload_on_branch_azure(upload_on_branch_recipe, jinja_env):
     cnfgr_fdstk.render_azure(
         jinja_env=jinja_env, forge_config=upload_on_branch_recipe.config, forge_dir=upload_on_branch_recipe.recipe
@@ -443,3 +558,447 @@ def test_files_skip_render(render_skipped_recipe, jinja_env):
     for f in skipped_files:
         fpath = os.path.join(render_skipped_recipe.recipe, f)
         assert not os.path.exists(fpath)
+
+
+def test_used_vars_cache(testing_workdir):
+    recipe_dir = os.path.join(testing_workdir, "recipe")
+    os.makedirs(recipe_dir)
+    with open(os.path.join(recipe_dir, "meta.yaml"), "w") as fh:
+        fh.write("requirements:\n  host:\n    - zlib  # [py<36]\n")
+
+    class FakeConfig(object):
+        def __init__(self, variant):
+            self.variant = variant
+            self.subdir = "linux-64"
+
+    class FakeMeta(object):
+        calls = 0
+
+        def __init__(self, variant):
+            self.config = FakeConfig(variant)
+            self.path = recipe_dir
+            self.meta_path = os.path.join(recipe_dir, "meta.yaml")
+            self.meta = {}
+
+        def name(self):
+            return "py-test"
+
+        def get_value(self, name, default=None):
+            return default
+
+        def get_used_vars(self, force_top_level=False):
+            FakeMeta.calls += 1
+            return {"python", "zlib"}
+
+        def get_loop_vars(self):
+            return {"python"}
+
+    cache = cnfgr_fdstk.UsedVarsCache()
+    assert cache.get_used_vars(FakeMeta({"python": "3.6", "zlib": "1.2"})) == {"python", "zlib"}
+    # only the values of variables the selectors can see take part in the key
+    assert cache.get_used_vars(FakeMeta({"python": "3.6", "zlib": "1.3"})) == {"python", "zlib"}
+    assert FakeMeta.calls == 1
+    assert cache.get_used_loop_vars(FakeMeta({"python": "3.6", "zlib": "1.2"})) == {"python"}
+    assert FakeMeta.calls == 1
+    cache.get_used_vars(FakeMeta({"python": "2.7", "zlib": "1.2"}))
+    assert FakeMeta.calls == 2
+    cache.get_used_vars(FakeMeta({"python": "2.7", "zlib": "1.2"}), force_top_level=True)
+    assert FakeMeta.calls == 3
+
+    # perl and lua selectors use short names as well
+    with open(os.path.join(recipe_dir, "meta.yaml"), "w") as fh:
+        fh.write("requirements:\n  host:\n    - zlib  # [pl<526]\n")
+    cache.get_used_vars(FakeMeta({"perl": "5.26", "zlib": "1.2"}))
+    cache.get_used_vars(FakeMeta({"perl": "5.30", "zlib": "1.2"}))
+    assert FakeMeta.calls == 5
+
+    # the content of included files is not known to the cache
+    with open(os.path.join(recipe_dir, "meta.yaml"), "w") as fh:
+        fh.write("{% set data = load_file_regex(load_file='x.py', regex_pattern='v') %}\n")
+    cache.get_used_vars(FakeMeta({"python": "3.6", "zlib": "1.2"}))
+    cache.get_used_vars(FakeMeta({"python": "3.6", "zlib": "1.2"}))
+    assert FakeMeta.calls == 7
+
+
+def test_conda_build_session_restores_environ(monkeypatch):
+    forge_config = {
+        "compiler_stack": "comp7",
+        "min_py_ver": "27",
+        "max_py_ver": "37",
+        "min_r_ver": "34",
+        "max_r_ver": "35",
+    }
+    monkeypatch.setenv("CF_MIN_PY_VER", "35")
+    monkeypatch.delenv("CF_COMPILER_STACK", raising=False)
+
+    with cnfgr_fdstk.conda_build_session(forge_config):
+        assert os.environ["CF_COMPILER_STACK"] == "comp7"
+        assert os.environ["CF_MIN_PY_VER"] == "27"
+
+    assert os.environ["CF_MIN_PY_VER"] == "35"
+    assert "CF_COMPILER_STACK" not in os.environ
+
+
+def test_pinning_cache(tmpdir, monkeypatch):
+    from hashlib import sha256
+
+    import conda_build.variants
+
+    pinning = tmpdir.join("conda_build_config.yaml")
+    pinning.write("zlib:\n- 1.2  # [linux or SOME_SELECTOR_VAR]\n")
+    recipe_config = tmpdir.mkdir("recipe").join("conda_build_config.yaml")
+    recipe_config.write("zlib:\n- 1.3\n")
+    forge_config = {
+        "compiler_stack": "comp7",
+        "min_py_ver": "27",
+        "max_py_ver": "37",
+        "min_r_ver": "34",
+        "max_r_ver": "35",
+        "exclusive_config_file": str(pinning),
+    }
+
+    class FakeConfig(object):
+        def __init__(self, platform, arch="64", variant=None):
+            self.platform = platform
+            self.arch = arch
+            self.variant = variant or {}
+
+    calls = []
+
+    def parse_config_file(path, config):
+        calls.append((path, config.platform))
+        return {"zlib": ["1.2"]}
+
+    monkeypatch.setattr(conda_build.variants, "parse_config_file", parse_config_file)
+    cache = cnfgr_fdstk.PinningCache(maxsize=4)
+
+    def parse(platform, forge_config=forge_config, path=pinning, **kwargs):
+        with cnfgr_fdstk.conda_build_session(forge_config), cnfgr_fdstk.cached_pinning(
+            forge_config, cache
+        ):
+            return conda_build.variants.parse_config_file(
+                str(path), FakeConfig(platform, **kwargs)
+            )
+
+    spec = parse("linux")
+    assert spec == {"zlib": ["1.2"]}
+    # callers get their own copy to modify
+    spec["zlib"].append("1.3")
+    assert parse("linux") == {"zlib": ["1.2"]}
+    assert len(calls) == 1
+    parse("osx")
+    assert len(calls) == 2
+    parse("linux", dict(forge_config, max_py_ver="38"))
+    assert len(calls) == 3
+    parse("linux", variant={"target_platform": "linux-aarch64"})
+    assert len(calls) == 4
+    # only the variables that the pinning can see are part of the key
+    monkeypatch.setenv("UNRELATED_VAR", "1")
+    parse("linux")
+    assert len(calls) == 4
+    monkeypatch.setenv("SOME_SELECTOR_VAR", "1")
+    parse("linux")
+    assert len(calls) == 5
+    monkeypatch.delenv("SOME_SELECTOR_VAR")
+    pinning.write("zlib:\n- 1.3  # [linux]\n")
+    parse("linux")
+    assert len(calls) == 6
+    # only the pinning is cached, not the variant files of the recipe
+    parse("linux", path=recipe_config)
+    parse("linux", path=recipe_config)
+    assert len(calls) == 8
+    # the least recently used specs are dropped
+    assert len(cache._specs) == 4
+    parse("osx")
+    assert len(calls) == 9
+    assert conda_build.variants.parse_config_file is parse_config_file
+    # the function is only replaced around the calls that parse the pinning
+    with cnfgr_fdstk.conda_build_session(forge_config):
+        assert conda_build.variants.parse_config_file is parse_config_file
+
+    # unchanged files are not hashed again
+    digests = []
+    monkeypatch.setattr(
+        cnfgr_fdstk.hashlib, "sha256", lambda data: digests.append(data) or sha256(data)
+    )
+    parse("linux")
+    assert digests == []
+
+
+def test_check_versions_uptodate():
+    class FakePackage(object):
+        def __init__(self, version):
+            self.version = version
+
+    class FakeResolve(object):
+        def get_pkgs(self, spec):
+            return [FakePackage("1.0"), FakePackage("2.0")]
+
+    context = cnfgr_fdstk.RenderContext()
+    context.resolve = FakeResolve()
+    cnfgr_fdstk._check_versions_uptodate(context, [("smithy", "2.0")], True)
+    cnfgr_fdstk._check_versions_uptodate(context, [("smithy", "1.0")], False)
+    future = cnfgr_fdstk._network_executor.submit(
+        cnfgr_fdstk._check_versions_uptodate,
+        context,
+        [("smithy", "2.0"), ("pinning", "1.0")],
+        True,
+    )
+    # errors of the background check surface where it is awaited
+    with pytest.raises(RuntimeError, match="pinning version in root env"):
+        future.result()
+
+
+def test_get_resolve_outside_conda_build_lock(monkeypatch):
+    import conda_build.conda_interface
+
+    def get_index(channel_urls):
+        return {"channel": channel_urls[0]}
+
+    monkeypatch.setattr(conda_build.conda_interface, "get_index", get_index)
+    monkeypatch.setattr(conda_build.conda_interface, "Resolve", dict, raising=False)
+    context = cnfgr_fdstk.RenderContext()
+    with cnfgr_fdstk._conda_build_lock:
+        future = cnfgr_fdstk._network_executor.submit(cnfgr_fdstk._get_resolve, context)
+        # the index is downloaded while a render holds the lock, only installing it waits
+        with pytest.raises(cnfgr_fdstk.FutureTimeoutError):
+            future.result(timeout=0.2)
+        assert context.resolve is None
+    resolve = future.result()
+    assert resolve == {"channel": "conda-forge"}
+    assert context.resolve is resolve
+    # a loaded index is not downloaded again
+    monkeypatch.setattr(conda_build.conda_interface, "get_index", None)
+    assert cnfgr_fdstk._get_resolve(context) is resolve
+
+
+def test_prerender_recipe(monkeypatch):
+    renders = []
+
+    def _render_recipe(forge_config, forge_dir, platform, arch, context):
+        renders.append((platform, arch))
+        return [(platform, arch)]
+
+    def _render_readme_recipe(forge_config, forge_dir, context):
+        return context.cached_render(
+            (forge_dir, "README"), lambda: renders.append("README")
+        )
+
+    monkeypatch.setattr(cnfgr_fdstk, "_render_recipe", _render_recipe)
+    monkeypatch.setattr(cnfgr_fdstk, "_render_readme_recipe", _render_readme_recipe)
+    forge_config = {
+        "provider": {"linux": "azure", "osx": "azure", "linux_aarch64": "drone"},
+        "azure": {"force": True},
+        "skip_render": [],
+    }
+    context = cnfgr_fdstk.RenderContext()
+    with context.holding_renders():
+        cnfgr_fdstk._prerender_recipe(forge_config, "feedstock", context)
+        # each platform is rendered once, even when several providers build it
+        assert renders == [("linux", "64"), ("osx", "64"), ("linux", "aarch64"), "README"]
+        # the CI providers reuse the renders
+        assert context.cached_render(
+            ("feedstock", "osx", "64"), lambda: renders.append("again")
+        ) == [("osx", "64")]
+    assert context.renders is None
+    assert len(renders) == 4
+
+    forge_config["skip_render"] = ["README.md"]
+    del renders[:]
+    cnfgr_fdstk._prerender_recipe(forge_config, "feedstock", context)
+    assert "README" not in renders
+
+    # renders kept by watch mode outlive the block
+    context = cnfgr_fdstk.RenderContext(keep_renders=True)
+    with context.holding_renders():
+        cnfgr_fdstk._prerender_recipe(forge_config, "feedstock", context)
+    assert ("feedstock", "linux", "64") in context.renders
+
+
+def test_subspace_config_dumper_is_local():
+    from collections import OrderedDict
+
+    data = OrderedDict([("b", {1}), ("a", (1, 2))])
+    dumped = yaml.dump(
+        data, Dumper=cnfgr_fdstk._SubspaceConfigDumper, default_flow_style=False
+    )
+    assert dumped == "b:\n- 1\na:\n- 1\n- 2\n"
+    assert "!!python" in yaml.dump(data)
+
+
+def test_conda_solver(testing_workdir):
+    with open(os.path.join(testing_workdir, "conda-forge.yml"), "w") as fh:
+        fh.write("conda_solver: mamba\n")
+    config = cnfgr_fdstk._load_forge_config(testing_workdir, None)
+    assert config["conda_solver_packages"] == "mamba boa"
+    assert config["conda_install_tool"] == "mamba"
+    assert config["conda_build_subcommand"] == "mambabuild"
+
+    with open(os.path.join(testing_workdir, "conda-forge.yml"), "w") as fh:
+        fh.write("conda_solver: fast\n")
+    with pytest.raises(ValueError):
+        cnfgr_fdstk._load_forge_config(testing_workdir, None)
+
+
+def test_vendor_fast_finish_script(py_recipe, jinja_env, monkeypatch):
+    import requests
+
+    urls = []
+
+    class FakeResponse(object):
+        text = "# upstream ff_ci_pr_build.py\n"
+
+        def raise_for_status(self):
+            pass
+
+    def get(url, timeout):
+        urls.append(url)
+        return FakeResponse()
+
+    monkeypatch.setattr(requests, "get", get)
+    py_recipe.config["vendor_fast_finish_script"] = "0123abc"
+    cnfgr_fdstk.vendor_fast_finish_script(py_recipe.config, py_recipe.recipe)
+    vendored = os.path.join(py_recipe.recipe, ".ci_support", "ff_ci_pr_build.py")
+    with open(vendored) as fh:
+        assert fh.read() == FakeResponse.text
+    assert urls == [cnfgr_fdstk.FAST_FINISH_SCRIPT_URL.format(ref="0123abc")]
+
+    # the copy of the same commit is not downloaded again, that of another one is
+    cnfgr_fdstk.vendor_fast_finish_script(py_recipe.config, py_recipe.recipe)
+    assert len(urls) == 1
+    py_recipe.config["vendor_fast_finish_script"] = "4567def"
+    cnfgr_fdstk.vendor_fast_finish_script(py_recipe.config, py_recipe.recipe)
+    assert urls[1:] == [cnfgr_fdstk.FAST_FINISH_SCRIPT_URL.format(ref="4567def")]
+
+    cnfgr_fdstk.render_circle(
+        jinja_env=jinja_env, forge_config=py_recipe.config, forge_dir=py_recipe.recipe
+    )
+    assert "cat .ci_support/ff_ci_pr_build.py" in py_recipe.config["fast_finish"]
+    assert "curl" not in py_recipe.config["fast_finish"]
+
+    py_recipe.config["vendor_fast_finish_script"] = False
+    cnfgr_fdstk.vendor_fast_finish_script(py_recipe.config, py_recipe.recipe)
+    assert not os.path.exists(vendored)
+    assert not os.path.exists(os.path.join(os.path.dirname(vendored), "ff_ci_pr_build.ref"))
+
+    # without a vendored copy the CI jobs download the script
+    def get_fails(url, timeout):
+        raise requests.ConnectionError("offline")
+
+    monkeypatch.setattr(requests, "get", get_fails)
+    py_recipe.config["vendor_fast_finish_script"] = "0123abc"
+    cnfgr_fdstk.vendor_fast_finish_script(py_recipe.config, py_recipe.recipe)
+    assert not os.path.exists(vendored)
+    cnfgr_fdstk.render_circle(
+        jinja_env=jinja_env, forge_config=py_recipe.config, forge_dir=py_recipe.recipe
+    )
+    assert "curl" in py_recipe.config["fast_finish"]
+
+
+@pytest.mark.parametrize("ref", [True, "master", "0123abc; rm -rf /"])
+def test_vendor_fast_finish_script_needs_a_commit(testing_workdir, ref):
+    with open(os.path.join(testing_workdir, "conda-forge.yml"), "w") as fh:
+        yaml.safe_dump({"vendor_fast_finish_script": ref}, fh)
+    with pytest.raises(ValueError):
+        cnfgr_fdstk._load_forge_config(testing_workdir, None)
+
+
+def test_dependency_manifest(py_recipe, jinja_env):
+    import json
+
+    py_recipe.config["skip_unchanged_configs"] = True
+    cnfgr_fdstk.render_azure(
+        jinja_env=jinja_env, forge_config=py_recipe.config, forge_dir=py_recipe.recipe
+    )
+    cnfgr_fdstk.write_dependency_manifest(py_recipe.config, py_recipe.recipe)
+    ci_support = os.path.join(py_recipe.recipe, ".ci_support")
+    assert os.path.exists(os.path.join(ci_support, "check_config_changes.py"))
+    with open(os.path.join(ci_support, "dependency_manifest.json")) as fh:
+        manifest = json.load(fh)
+    configs = manifest["configs"]
+    assert sorted(configs) == sorted(
+        config_name for config_name, _, _, _ in py_recipe.config["configs"]
+    )
+    for dependencies in configs.values():
+        # its effect on the configs is known from their rendered metadata
+        assert "recipe/meta.yaml" not in dependencies["files"]
+        assert "python" in dependencies["variant_keys"]
+        assert dependencies["rendered"]
+    # python variants render to different metadata
+    assert len(set(dependencies["rendered"] for dependencies in configs.values())) > 1
+    assert manifest["rendered_from"]["recipe/meta.yaml"] == cnfgr_fdstk._git_blob_sha(
+        os.path.join(py_recipe.recipe, "recipe", "meta.yaml")
+    )
+
+
+class FakeMeta(object):
+    def __init__(self, meta):
+        self.meta = meta
+
+    def get_section(self, section):
+        return self.meta.get(section, {})
+
+    def get_value(self, name):
+        section, key = name.split("/")
+        return self.get_section(section).get(key)
+
+
+def test_config_dependencies(tmpdir):
+    from types import SimpleNamespace
+
+    tmpdir.mkdir("recipe")
+
+    def fake_meta(variant, used, test):
+        meta = FakeMeta({"test": {"commands": [test]}})
+        meta.config = SimpleNamespace(variant=variant)
+        meta.used = used
+        return meta
+
+    metas = [
+        fake_meta({"python": "3.7", "numpy": "1.16"}, {"python", "numpy"}, "a"),
+        fake_meta({"python": "3.8", "numpy": "1.16"}, {"python"}, "b"),
+    ]
+    context = SimpleNamespace(
+        used_vars_cache=SimpleNamespace(get_used_vars=lambda meta: meta.used)
+    )
+    config = {"python": ["3.8"], "numpy": ["1.16"], "docker_image": ["image"]}
+    dependencies = cnfgr_fdstk._config_dependencies(
+        metas, config, {"python"}, str(tmpdir), "linux", context
+    )
+    # numpy is only used by the other config
+    assert dependencies["variant_keys"] == ["docker_image", "python"]
+    other = cnfgr_fdstk._config_dependencies(
+        metas, dict(config, python=["3.7"]), {"python"}, str(tmpdir), "linux", context
+    )
+    assert other["variant_keys"] == ["docker_image", "numpy", "python"]
+    assert other["rendered"] != dependencies["rendered"]
+
+
+def test_recipe_files_used(tmpdir):
+    recipe = tmpdir.mkdir("recipe")
+    for fname in (
+        "meta.yaml",
+        "build.sh",
+        "bld.bat",
+        "fix.patch",
+        "fix.patch.orig",
+        "install-lib.sh",
+        "tests/data.txt",
+        "tests/more/data.txt",
+        "unused.txt",
+    ):
+        recipe.join(fname).write("", ensure=True)
+    meta = FakeMeta(
+        {
+            "source": [{"url": "https://example.com/a.tgz", "patches": ["fix.patch"]}],
+            "test": {"files": ["tests"]},
+        }
+    )
+    output = FakeMeta({"script": "install-lib.sh", "test": {"files": ["tests/*.txt"]}})
+    assert cnfgr_fdstk._recipe_files_used([meta, output], str(tmpdir), "linux") == [
+        "recipe/build.sh",
+        "recipe/fix.patch",
+        "recipe/install-lib.sh",
+        "recipe/tests/data.txt",
+        "recipe/tests/more/data.txt",
+    ]
@@ -1,3 +1,5 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stderr, redirect_stdout
 import functools
 import io
 import operator as op
@@ -5,6 +7,7 @@ import os
 import stat
 import shutil
 import tempfile
+import time
 import unittest
 
 import git
@@ -57,6 +60,41 @@ class TestFeedstockIO(unittest.TestCase):
             else:
                 self.assertIsInstance(fio.get_repo(pathfunc(tmp_dir)), git.Repo)
 
+    def test_repo_cache(self):
+        tmp_dir = os.path.realpath(self.tmp_dir)
+        subdir = os.path.join(tmp_dir, "dir1", "dir2")
+        os.makedirs(subdir)
+        self.assertIsNone(fio.get_repo(subdir))
+
+        # a repository created in the directory after the lookup is found
+        git.Repo.init(subdir)
+        self.assertEqual(fio.get_repo(subdir).working_tree_dir, subdir)
+
+        # and so is the one of a parent when it disappears
+        shutil.rmtree(os.path.join(subdir, ".git"))
+        repo = git.Repo.init(tmp_dir)
+        cached = fio.get_repo(subdir)
+        self.assertEqual(cached.working_tree_dir, repo.working_tree_dir)
+        self.assertIs(fio.get_repo(os.path.join(subdir, "test.txt")), cached)
+        self.assertIs(fio.get_repo(tmp_dir), cached)
+
+        # a repository nested between the directory and the cached one is found
+        nested_dir = os.path.join(tmp_dir, "dir1")
+        git.Repo.init(nested_dir)
+        self.assertEqual(fio.get_repo(subdir).working_tree_dir, nested_dir)
+        shutil.rmtree(os.path.join(nested_dir, ".git"))
+        cached = fio.get_repo(subdir)
+        self.assertEqual(cached.working_tree_dir, repo.working_tree_dir)
+
+        # other threads get their own git.Repo
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            other = executor.submit(fio.get_repo, subdir).result()
+        self.assertIsNot(other, cached)
+        self.assertEqual(other.working_tree_dir, cached.working_tree_dir)
+
+        shutil.rmtree(os.path.join(tmp_dir, ".git"))
+        self.assertIsNone(fio.get_repo(subdir))
+
     def test_set_exe_file(self):
         perms = [stat.S_IXUSR, stat.S_IXGRP, stat.S_IXOTH]
 
@@ -188,6 +226,171 @@ class TestFeedstockIO(unittest.TestCase):
 
                 self.assertEqual(write_text, read_text)
 
+    def test_index_session(self):
+        for tmp_dir, repo, pathfunc in parameterize():
+            removed = os.path.join(tmp_dir, "removed.txt")
+            with io.open(removed, "w", encoding="utf-8", newline="\n") as fh:
+                fh.write("")
+            if repo is not None:
+                repo.index.add([removed])
+                index_file = os.path.join(tmp_dir, ".git", "index")
+                index_mtime = os.stat(index_file).st_mtime_ns
+
+            def entry(filename):
+                key = (os.path.relpath(filename, tmp_dir).replace(os.sep, "/"), 0)
+                return repo.index.entries.get(key)
+
+            filenames = [os.path.join(tmp_dir, "dir1", "test%d.txt" % i) for i in range(5)]
+            with fio.index_session(pathfunc(tmp_dir)):
+                for filename in filenames:
+                    with fio.write_file(pathfunc(filename)) as fh:
+                        fh.write("text")
+                fio.set_exe_file(pathfunc(filenames[0]))
+                fio.remove_file(pathfunc(removed))
+                if repo is not None:
+                    # nothing is staged before the session ends
+                    self.assertEqual(os.stat(index_file).st_mtime_ns, index_mtime)
+                    self.assertIsNone(entry(filenames[0]))
+                    self.assertIsNotNone(entry(removed))
+
+            self.assertFalse(os.path.exists(removed))
+            self.assertTrue(os.stat(filenames[0]).st_mode & stat.S_IXUSR)
+            if repo is not None:
+                for filename in filenames:
+                    blob = repo.odb.stream(entry(filename).binsha)
+                    self.assertEqual(blob.read().decode("utf-8"), "text")
+                self.assertEqual(entry(filenames[0]).mode & stat.S_IXUSR, stat.S_IXUSR)
+                self.assertEqual(entry(filenames[1]).mode & stat.S_IXUSR, 0)
+                self.assertIsNone(entry(removed))
+
+    def test_copy_file_newlines(self):
+        cases = [
+            (b"a\r\nb\rc\n", b"a\nb\nc\n"),
+            (b"\xc3\xa9\r\n\r\r\n", b"\xc3\xa9\n\n\n"),
+            (b"no carriage returns\n", b"no carriage returns\n"),
+            # not utf-8, copied as is
+            (b"\xff\r\n", b"\xff\r\n"),
+            (b"a\r\n" * 10 + b"\xe2\x82", b"a\r\n" * 10 + b"\xe2\x82"),
+        ]
+        old_chunk_size = fio.COPY_CHUNK_SIZE
+        try:
+            # CRLF and multi-byte characters split between chunks
+            for chunk_size in [1, 2, 3, old_chunk_size]:
+                fio.COPY_CHUNK_SIZE = chunk_size
+                for data, expected in cases:
+                    with io.open("src", "wb") as fh:
+                        fh.write(data)
+                    fio.copy_file("src", "dst")
+                    with io.open("dst", "rb") as fh:
+                        self.assertEqual(fh.read(), expected)
+        finally:
+            fio.COPY_CHUNK_SIZE = old_chunk_size
+
+    def test_copy_file_skip_identical(self):
+        with io.open("src", "w", encoding="utf-8", newline="\n") as fh:
+            fh.write("text")
+        fio.copy_file("src", "dst")
+        os.utime("dst", (0, 0))
+
+        fio.copy_file("src", "dst", skip_identical=True)
+        self.assertEqual(os.stat("dst").st_mtime, 0)
+
+        # a different mode is not identical
+        os.chmod("dst", 0o600)
+        os.chmod("src", 0o644)
+        fio.copy_file("src", "dst", skip_identical=True)
+        self.assertNotEqual(os.stat("dst").st_mtime, 0)
+        self.assertEqual(stat.S_IMODE(os.stat("dst").st_mode), 0o644)
+
+        with io.open("src", "w", encoding="utf-8", newline="\n") as fh:
+            fh.write("new text")
+        fio.copy_file("src", "dst", skip_identical=True)
+        with io.open("dst", "r", encoding="utf-8") as fh:
+            self.assertEqual(fh.read(), "new text")
+
+        # a dst with the carriage returns of src still gets the normalized line endings
+        with io.open("src", "wb") as fh:
+            fh.write(b"line\r\n")
+        shutil.copy2("src", "dst")
+        fio.copy_file("src", "dst", skip_identical=True)
+        with io.open("dst", "rb") as fh:
+            self.assertEqual(fh.read(), b"line\n")
+
+    def test_copytree(self):
+        for tmp_dir, repo, pathfunc in parameterize():
+            src = os.path.join(tmp_dir, "src")
+            filenames = ["a.txt", "dir1/b.txt", "dir1/dir2/c.txt", "skipped/d.txt", "e.txt"]
+            for filename in filenames:
+                filename = os.path.join(src, filename)
+                if not os.path.exists(os.path.dirname(filename)):
+                    os.makedirs(os.path.dirname(filename))
+                with io.open(filename, "w", encoding="utf-8", newline="\n") as fh:
+                    fh.write(filename)
+
+            dst = os.path.join(tmp_dir, "dst")
+            fio.copytree(
+                pathfunc(src), pathfunc(dst), ignore=["skipped", "e.txt"], max_workers=2
+            )
+
+            for filename in filenames:
+                copied = os.path.join(dst, filename)
+                if filename.startswith("skipped") or filename == "e.txt":
+                    self.assertFalse(os.path.exists(copied))
+                    continue
+                with io.open(copied, "r", encoding="utf-8") as fh:
+                    self.assertEqual(fh.read(), os.path.join(src, filename))
+                if repo is not None:
+                    key = (os.path.join("dst", filename).replace(os.sep, "/"), 0)
+                    self.assertIn(key, repo.index.entries)
+
+    def test_io_stats(self):
+        git.Repo.init(self.tmp_dir)
+        baseline = fio.io_stats.snapshot()
+
+        def counted(name):
+            return fio.io_stats.snapshot().get(name, 0) - baseline.get(name, 0)
+
+        with fio.write_file("test.txt") as fh:
+            fh.write("text")
+        self.assertEqual(counted("write_file.calls"), 1)
+        self.assertEqual(counted("write_file.bytes"), 4)
+        self.assertEqual(counted("git.index_writes"), 1)
+
+        # the time the caller takes to produce the content is not part of the write
+        clock = [time.perf_counter()]
+        perf_counter, fio.time.perf_counter = fio.time.perf_counter, lambda: clock[0]
+        try:
+            with fio.write_file("other.txt") as fh:
+                clock[0] += 100
+                fh.write("text")
+        finally:
+            fio.time.perf_counter = perf_counter
+        self.assertLess(counted("write_file.seconds"), 100)
+        self.assertEqual(counted("write_file.calls"), 2)
+        self.assertEqual(counted("git.index_writes"), 2)
+
+        with fio.index_session(self.tmp_dir):
+            fio.copy_file("test.txt", "copy.txt")
+            fio.copy_file("test.txt", "copy.txt", skip_identical=True)
+            fio.set_exe_file("copy.txt")
+        self.assertEqual(counted("copy_file.calls"), 2)
+        self.assertEqual(counted("copy_file.bytes"), 4)
+        self.assertEqual(counted("copy_file.skipped"), 1)
+        self.assertEqual(counted("git.index_writes"), 3)
+        self.assertEqual(counted("git.subprocesses"), 0)
+
+        fio.remove_file("copy.txt")
+        self.assertEqual(counted("remove_file.calls"), 1)
+        self.assertEqual(counted("git.subprocesses"), 1)
+        self.assertIn("git index writes", fio.io_stats.report(since=baseline))
+
+        # the report stays out of the output of the commands
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            fio.io_stats.write_report(since=baseline)
+        self.assertEqual(stdout.getvalue(), "")
+        self.assertIn("git index writes", stderr.getvalue())
+
     def tearDown(self):
         os.chdir(self.old_dir)
         del self.old_dir
@@ -0,0 +1,106 @@
+import github
+import pytest
+import requests
+
+from nwb_extensions_smithy import github_users
+from nwb_extensions_smithy.utils import JSONFileCache
+
+
+class FakeResponse(object):
+    def __init__(self, result):
+        self._result = result
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._result
+
+
+class FakeGithub(object):
+    def __init__(self, users):
+        self.users = users
+        self.calls = []
+
+    def get_user(self, login):
+        self.calls.append(login)
+        if login not in self.users:
+            raise github.UnknownObjectException(404, {}, {})
+        return login
+
+
+@pytest.fixture
+def cache(tmpdir):
+    return JSONFileCache(str(tmpdir.join("github_users.json")), ttl=60)
+
+
+def test_check_logins_single_query(cache, monkeypatch):
+    queries = []
+
+    def post(url, json, headers, timeout):
+        queries.append(json["variables"])
+        data, errors = {}, []
+        for name, login in json["variables"].items():
+            alias = "u" + name[1:]
+            if login.startswith("ghost"):
+                data[alias] = None
+                errors.append({"type": "NOT_FOUND", "path": [alias]})
+            else:
+                data[alias] = {"login": login}
+        return FakeResponse({"data": data, "errors": errors})
+
+    monkeypatch.setattr(requests, "post", post)
+    logins = ["alice", "bob", "ghost", "alice", "org/team"]
+    assert github_users.check_logins(logins, "token", cache=cache) == {
+        "alice": True,
+        "bob": True,
+        "ghost": False,
+    }
+    assert len(queries) == 1
+    assert sorted(queries[0].values()) == ["alice", "bob", "ghost"]
+
+    # the answers, negative ones included, are cached on disk
+    other_cache = JSONFileCache(cache.path, ttl=60)
+    assert github_users.check_logins(["ghost", "bob"], "token", cache=other_cache) == {
+        "bob": True,
+        "ghost": False,
+    }
+    assert len(queries) == 1
+
+    # only the new logins are queried
+    github_users.check_logins(["alice", "carol", "ghost2"], "token", cache=cache)
+    assert len(queries) == 2
+    assert sorted(queries[1].values()) == ["carol", "ghost2"]
+
+
+def test_check_logins_rest_fallback(cache, monkeypatch):
+    def post(url, json, headers, timeout):
+        raise requests.ConnectionError("no graphql")
+
+    gh = FakeGithub({"alice"})
+    monkeypatch.setattr(requests, "post", post)
+    monkeypatch.setattr(github_users, "github_client", lambda token: gh)
+    assert github_users.check_logins(["alice", "ghost"], "token", cache=cache) == {
+        "alice": True,
+        "ghost": False,
+    }
+    assert sorted(gh.calls) == ["alice", "ghost"]
+    github_users.check_logins(["alice", "ghost"], "token", cache=cache)
+    assert len(gh.calls) == 2
+
+
+def test_query_graphql_null_owner(monkeypatch):
+    def post(url, json, headers, timeout):
+        # unknown logins come back as null owners, with or without an error
+        return FakeResponse(
+            {
+                "data": {"u0": {"login": "alice"}, "u1": None, "u2": None},
+                "errors": [{"type": "RATE_LIMITED", "path": ["u2"]}],
+            }
+        )
+
+    monkeypatch.setattr(requests, "post", post)
+    assert github_users.query_graphql(["alice", "ghost", "bob"], "token") == {
+        "alice": True,
+        "ghost": False,
+    }
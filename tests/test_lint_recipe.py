@@ -635,6 +635,50 @@ class Test_linter(unittest.TestCase):
                 else:
                     self.assertIn(expected_message, lints)
 
+    def test_read_recipe_lines(self):
+        with tmp_directory() as recipe_dir:
+            meta_fname = os.path.join(recipe_dir, "ndx-meta.yaml")
+            with io.open(meta_fname, "w") as fh:
+                fh.write(
+                    textwrap.dedent(
+                        """\
+                        {%set version = "1.0" %}
+                        build:
+                          skip: true  # [win]
+                        requirements:
+                          host:
+                            - python  # [py3k]
+
+                          run:
+                            - numpy
+                          build:
+                            - cmake # [unix]
+                        """
+                    )
+                )
+            recipe_lines = linter.read_recipe_lines(meta_fname)
+
+        self.assertEqual(list(range(12)), [line.number for line in recipe_lines])
+        self.assertEqual("", recipe_lines[-1].text)
+        self.assertEqual([0], [line.number for line in recipe_lines if line.jinja])
+        self.assertEqual(
+            [2, 5, 10], [line.number for line in recipe_lines if line.selector]
+        )
+        self.assertEqual(
+            [(5, "host"), (6, "host"), (8, "run")],
+            [(line.number, line.section) for line in recipe_lines if line.section],
+        )
+        self.assertEqual("    ", recipe_lines[5].indent)
+        self.assertEqual("", recipe_lines[6].indent)
+        self.assertEqual(
+            [2, 5],
+            [
+                line.number
+                for line in recipe_lines
+                if linter.is_arch_specific_line(line)
+            ],
+        )
+
     def test_cb3_jinja2_functions(self):
         lints = linter.main(
             os.path.join(_thisdir, "recipes", "cb3_jinja2_functions", "recipe")
@@ -850,6 +894,49 @@ class Test_linter(unittest.TestCase):
         ]
         self.assertEqual(expected_messages, filtered_lints)
 
+    def test_rule_selection(self):
+        meta = {
+            "about": {"license": "unknown"},
+            "build": {"script": "python setup.py install"},
+        }
+        all_lints, all_hints = linter.lintify(meta)
+        self.assertIn("The recipe license cannot be unknown.", all_lints)
+        self.assertTrue(all_hints)
+
+        lints, hints = linter.lintify(meta, select=["L5"])
+        self.assertEqual(["The recipe license cannot be unknown."], lints)
+        self.assertEqual([], hints)
+
+        lints, hints = linter.lintify(meta, ignore=["L5", "H"])
+        self.assertEqual([lint for lint in all_lints if "unknown" not in lint], lints)
+        self.assertEqual([], hints)
+
+        lints, hints = linter.lintify(meta, select=["H"])
+        self.assertEqual([], lints)
+        self.assertEqual(all_hints, hints)
+
+        # the type of the sections is a rule like the others
+        meta = {"build": ["not", "a", "dictionary"]}
+        type_lint = 'The "build" section was expected to be a dictionary, but got a list.'
+        self.assertIn(type_lint, linter.lintify(meta)[0])
+        self.assertEqual([type_lint], linter.lintify(meta, select=["L0a"])[0])
+        self.assertNotIn(type_lint, linter.lintify(meta, ignore=["L0a"])[0])
+
+        with self.assertRaises(ValueError):
+            linter.select_rules(select=["L99"])
+
+    def test_rule_profile(self):
+        profile = linter.RuleProfile()
+        linter.lintify({}, profile=profile)
+        linter.lintify({}, select=["L7", "H1"], profile=profile)
+        self.assertEqual(2, profile.recipes)
+        self.assertEqual(2, profile.calls["L7"])
+        self.assertEqual(1, profile.calls["L0"])
+        self.assertEqual(set(linter.RULES), set(profile.calls))
+        report = profile.report()
+        self.assertIn("L7", report)
+        self.assertIn(linter.RULES["L7"].description, report)
+
 
 @pytest.mark.cli
 class TestCLI_recipe_lint(unittest.TestCase):
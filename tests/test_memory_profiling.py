@@ -0,0 +1,44 @@
+import time
+
+import pytest
+
+from nwb_extensions_smithy import memory_profiling
+
+
+def test_phase_report():
+    profiler = memory_profiling.MemoryProfiler()
+    with memory_profiling.profiling(profiler):
+        with profiler.phase("outer"):
+            data = [bytearray(1024) for _ in range(1000)]
+            with profiler.phase("inner"):
+                more = bytearray(2 ** 20)
+    del data, more
+
+    assert list(profiler.phases) == ["inner", "outer"]
+    assert profiler.phases["outer"].traced_peak >= 2 ** 20
+    report = profiler.report()
+    assert "inner" in report and "outer" in report
+
+
+def test_memory_limit():
+    limit = memory_profiling.current_rss() + 32 * 2 ** 20
+    profiler = memory_profiling.MemoryProfiler(limit=limit, interval=0.01)
+    chunks = []
+    with pytest.raises(memory_profiling.MemoryLimitExceeded) as excinfo:
+        with memory_profiling.profiling(profiler):
+            with profiler.phase("grow"):
+                for _ in range(1000):
+                    chunk = bytearray(2 ** 20)
+                    # touch the pages so that they count towards the RSS
+                    chunk[::4096] = b"\1" * len(chunk[::4096])
+                    chunks.append(chunk)
+                    time.sleep(0.001)
+    assert "'grow'" in str(excinfo.value)
+
+
+def test_parse_size():
+    assert memory_profiling.parse_size("512M") == 512 * 2 ** 20
+    assert memory_profiling.parse_size("4GiB") == 4 * 2 ** 30
+    assert memory_profiling.parse_size(1000) == 1000
+    with pytest.raises(ValueError):
+        memory_profiling.parse_size("lots")
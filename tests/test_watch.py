@@ -0,0 +1,64 @@
+import os
+
+from nwb_extensions_smithy import watch
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as fh:
+        fh.write(content)
+
+
+def test_changed_paths(tmpdir):
+    forge_dir = str(tmpdir)
+    _write(os.path.join(forge_dir, "recipe", "meta.yaml"), "a")
+    _write(os.path.join(forge_dir, "templates", "README.md.tmpl"), "a")
+    _write(os.path.join(forge_dir, "README.md"), "a")
+    old = watch.snapshot(forge_dir)
+    assert sorted(old) == [
+        os.path.join("recipe", "meta.yaml"),
+        os.path.join("templates", "README.md.tmpl"),
+    ]
+
+    _write(os.path.join(forge_dir, "templates", "README.md.tmpl"), "bb")
+    _write(os.path.join(forge_dir, "README.md"), "bb")
+    paths = watch.changed_paths(old, watch.snapshot(forge_dir))
+    assert paths == [os.path.join("templates", "README.md.tmpl")]
+    assert watch.templates_only(paths)
+
+    _write(os.path.join(forge_dir, "conda-forge.yml"), "{}")
+    paths = watch.changed_paths(old, watch.snapshot(forge_dir))
+    assert not watch.templates_only(paths)
+
+
+def test_watch_reuses_renders_for_template_changes(tmpdir, monkeypatch):
+    forge_dir = str(tmpdir)
+    meta_yaml = os.path.join(forge_dir, "recipe", "meta.yaml")
+    template = os.path.join(forge_dir, "templates", "README.md.tmpl")
+    _write(meta_yaml, "a")
+    _write(template, "a")
+
+    contexts = []
+    renders = []
+
+    def main(forge_dir, context, **kwargs):
+        contexts.append(context)
+        renders.append(dict(context.renders))
+        context.cached_render("recipe", lambda: object())
+
+    edits = iter([(template, "bb"), (meta_yaml, "bb")])
+
+    def wait(self):
+        path, content = next(edits)
+        _write(path, content)
+
+    monkeypatch.setattr(watch.configure_feedstock, "main", main)
+    monkeypatch.setattr(watch, "inotify_simple", None)
+    monkeypatch.setattr(watch._PollingWaiter, "wait", wait)
+
+    assert watch.watch(forge_dir, max_rerenders=3) == 3
+    assert len(set(map(id, contexts))) == 1
+    # the template edit keeps the render, the recipe edit throws it away
+    assert renders[0] == {}
+    assert list(renders[1]) == ["recipe"]
+    assert renders[2] == {}